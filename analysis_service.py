@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+"""
+WeChat Statement Analysis Service
+
+Local HTTP service that lets several people submit statements for analysis
+on one machine. Uploads are queued onto a bounded worker pool, progress can
+be streamed back while a job runs, and finished jobs return the monthly
+statistics as JSON (plus ocr_failed_pages when scanned pages could not be
+read). Analyses run in separate processes (one per worker),
+so --workers N really uses N CPU cores.
+
+Endpoints:
+    POST /jobs?filename=bill.pdf   upload a statement (.pdf, .xlsx or .csv)
+    GET  /jobs/<id>                job status, and monthly stats once done
+    GET  /jobs/<id>/events         progress stream (one JSON object per line)
+    GET  /metrics                  request latency, queue depth, job counters
+    GET  /health                   liveness check
+
+Usage:
+    python analysis_service.py serve [--port 8000] [--workers 2] [--queue-size 16]
+    python analysis_service.py bench statement.pdf [--requests 50] [--concurrency 10]
+
+Examples:
+    curl --data-binary @bill.pdf "http://127.0.0.1:8000/jobs?filename=bill.pdf"
+    curl -N http://127.0.0.1:8000/jobs/<id>/events
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.managers import SyncManager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from wechat_transactions import convert_pdf_to_excel, process_wechat_statement
+
+SUPPORTED_EXTENSIONS = (".pdf", ".xlsx", ".csv")
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+MAX_FINISHED_JOBS = 1000
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LatencyStats:
+    """Count, mean and percentiles over the most recent samples."""
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": percentile(self.recent, 0.50),
+            "p95": percentile(self.recent, 0.95),
+            "p99": percentile(self.recent, 0.99),
+            "max": self.max,
+        }
+
+
+def _ignore_interrupt():
+    # Ctrl-C reaches the whole process group; the parent shuts children down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def analyze_statement(path, job_id=None, events=None):
+    """
+    Convert (PDF only) and analyze one uploaded statement.
+
+    Runs in a worker process; progress is reported as (job_id, progress,
+    message) tuples on the events queue.
+
+    Returns:
+        (monthly statistics as a list of JSON-ready dicts, numbers of PDF
+        pages whose OCR failed)
+    """
+    def report(progress, message):
+        if events is not None:
+            events.put((job_id, progress, message))
+
+    statement = path
+    failed_pages = []
+    if path.lower().endswith(".pdf"):
+        statement = os.path.splitext(path)[0] + ".xlsx"
+
+        def on_page(done, total):
+            # PDF conversion is the bulk of the work: 0-90%
+            report(0.9 * done / total if total else 0.0, f"converting page {done}/{total}")
+
+        # Uploads are throwaway files, resuming them is pointless. Each
+        # worker already has its own process, so OCR runs inline
+        if not convert_pdf_to_excel(path, statement, checkpoint=False, progress=on_page,
+                                    ocr_workers=1, failed_pages=failed_pages):
+            raise ValueError("No tables found in PDF")
+
+    report(0.9, "computing statistics")
+    stats = process_wechat_statement(statement)
+    return json.loads(stats.to_json(orient="records", force_ascii=False)), failed_pages
+
+
+class Job:
+    def __init__(self, filename, path):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.ocr_failed_pages = []
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def as_dict(self, include_result=True):
+        data = {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "message": self.message,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_result and self.result is not None:
+            data["monthly_stats"] = self.result
+        if self.ocr_failed_pages:
+            # Transactions on these pages are missing from the statistics
+            data["ocr_failed_pages"] = self.ocr_failed_pages
+        return data
+
+
+class AnalysisService:
+    """
+    Bounded job queue in front of a fixed pool of analysis workers.
+
+    Worker threads take jobs off the queue and hand the CPU-bound analysis
+    to a process pool of the same size, so jobs run in parallel despite
+    the GIL. Progress comes back over a manager queue.
+    """
+
+    def __init__(self, workers=2, queue_size=16, work_dir=None):
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="wxls-service-")
+        self.jobs = OrderedDict()
+        self.changed = threading.Condition()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.counters = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0}
+        self.request_latency = {}
+        self.queue_wait = LatencyStats()
+        self.job_duration = LatencyStats()
+        self.manager = SyncManager()
+        self.manager.start(_ignore_interrupt)
+        self.events = self.manager.Queue()
+        self.processes = self._process_pool()
+        self.events_thread = threading.Thread(target=self._relay_events, daemon=True)
+        self.events_thread.start()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        for _ in range(workers):
+            self.pool.submit(self._worker)
+
+    def submit(self, filename, data):
+        """Queue an uploaded statement; raises queue.Full when the queue is full."""
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {ext or filename}")
+
+        job = Job(filename, None)
+        job.path = os.path.join(self.work_dir, job.id + ext)
+        with open(job.path, "wb") as f:
+            f.write(data)
+
+        with self.lock:
+            self.jobs[job.id] = job
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            os.remove(job.path)
+            with self.lock:
+                del self.jobs[job.id]
+                self.counters["rejected"] += 1
+            raise
+
+        with self.lock:
+            self.counters["submitted"] += 1
+            self._evict_finished()
+        return job
+
+    def _evict_finished(self):
+        while len(self.jobs) > MAX_FINISHED_JOBS:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if not oldest.done:
+                break
+            del self.jobs[oldest_id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _update(self, job, **changes):
+        with self.changed:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+            self.changed.notify_all()
+
+    def _relay_events(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            job_id, progress, message = event
+            job = self.get(job_id)
+            if job is None:
+                continue
+            with self.changed:
+                # A late event must not rewind a job that already finished
+                if job.done:
+                    continue
+                job.progress = max(job.progress, progress)
+                job.message = message
+                job.version += 1
+                self.changed.notify_all()
+
+    def wait_for_change(self, job, seen_version, timeout):
+        with self.changed:
+            self.changed.wait_for(lambda: job.version != seen_version, timeout=timeout)
+            return job.version
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            with self.lock:
+                self.active += 1
+                self.queue_wait.add(time.time() - job.submitted)
+            self._update(job, status="running", started=time.time())
+            try:
+                result, failed_pages = self._analyze(job)
+                outcome = {"status": "done", "result": result,
+                           "ocr_failed_pages": failed_pages, "progress": 1.0, "message": ""}
+            except Exception as e:
+                outcome = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            finally:
+                self._cleanup(job)
+
+            finished = time.time()
+            with self.lock:
+                self.active -= 1
+                self.job_duration.add(finished - job.started)
+                self.counters[outcome["status"]] += 1
+            self._update(job, finished=finished, **outcome)
+
+    def _analyze(self, job):
+        processes = self.processes
+        try:
+            return processes.submit(analyze_statement, job.path, job.id, self.events).result()
+        except BrokenProcessPool:
+            # A crashed analysis process breaks the whole pool; replace it for later jobs
+            with self.lock:
+                if self.processes is processes:
+                    self.processes = self._process_pool()
+            processes.shutdown(wait=False)
+            raise
+
+    def _process_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_interrupt)
+
+    def _cleanup(self, job):
+        base = os.path.splitext(job.path)[0]
+        for path in (job.path, base + ".xlsx", base + ".xlsx.checkpoint.jsonl"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def record_latency(self, route, seconds):
+        with self.lock:
+            self.request_latency.setdefault(route, LatencyStats()).add(seconds)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "workers": self.workers,
+                "active_workers": self.active,
+                "jobs": dict(self.counters),
+                "queue_wait_seconds": self.queue_wait.as_dict(),
+                "job_duration_seconds": self.job_duration.as_dict(),
+                "request_latency_seconds": {
+                    route: stats.as_dict() for route, stats in self.request_latency.items()
+                },
+            }
+
+    def shutdown(self):
+        for _ in range(self.workers):
+            self.queue.put(None)
+        self.pool.shutdown(wait=True)
+        self.processes.shutdown(wait=True)
+        self.events.put(None)
+        self.events_thread.join()
+        self.manager.shutdown()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, path):
+        parts = [p for p in path.split("/") if p]
+        if parts[:1] == ["jobs"]:
+            return "/jobs" + ("/{id}" if len(parts) > 1 else "") + (
+                "/events" if len(parts) > 2 else ""
+            )
+        return path
+
+    def _timed(self, handler):
+        started = time.monotonic()
+        path = urlsplit(self.path).path
+        try:
+            handler(path)
+        finally:
+            self.service.record_latency(
+                f"{self.command} {self._route(path)}", time.monotonic() - started
+            )
+
+    def do_POST(self):
+        self._timed(self._post)
+
+    def do_GET(self):
+        self._timed(self._get)
+
+    def _post(self, path):
+        if path != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send_json(400, {"error": "Empty upload"})
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self._send_json(413, {"error": "Upload too large"})
+            self.close_connection = True
+            return
+
+        query = parse_qs(urlsplit(self.path).query)
+        filename = (query.get("filename") or [self.headers.get("X-Filename", "")])[0]
+        data = self.rfile.read(length)
+
+        try:
+            job = self.service.submit(os.path.basename(filename), data)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except queue.Full:
+            self._send_json(503, {"error": "Queue is full, retry later"})
+        else:
+            self._send_json(202, {
+                "id": job.id,
+                "status_url": f"/jobs/{job.id}",
+                "events_url": f"/jobs/{job.id}/events",
+            })
+
+    def _get(self, path):
+        parts = [p for p in path.split("/") if p]
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/metrics":
+            self._send_json(200, self.service.metrics())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": "Unknown job"})
+            else:
+                self._send_json(200, job.as_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self.service.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": "Unknown job"})
+            else:
+                self._stream_events(job)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_events(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        seen = None
+        while True:
+            version = job.version
+            if version != seen:
+                seen = version
+                event = job.as_dict(include_result=job.done)
+                self._write_chunk(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+                if job.done:
+                    break
+            # Time out periodically to resend state as a keep-alive
+            if self.service.wait_for_change(job, seen, timeout=15) == seen:
+                seen = None
+        self._write_chunk(b"")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host, port, workers, queue_size):
+    service = AnalysisService(workers=workers, queue_size=queue_size)
+    AnalysisHandler.service = service
+    server = ThreadingHTTPServer((host, port), AnalysisHandler)
+    server.daemon_threads = True
+    print(f"Analysis service on http://{host}:{port}/ "
+          f"({workers} workers, queue size {queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def _request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body, headers or {})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read() or b"null")
+
+
+def bench(url, statement, requests, concurrency, poll_interval=0.2):
+    """Submit a statement many times concurrently and report latencies."""
+    parts = urlsplit(url)
+    with open(statement, "rb") as f:
+        data = f.read()
+    filename = os.path.basename(statement)
+
+    submit_latency = LatencyStats(window=requests)
+    total_latency = LatencyStats(window=requests)
+    outcomes = {"done": 0, "failed": 0, "rejected": 0, "error": 0}
+    lock = threading.Lock()
+
+    def one(_):
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=600)
+        started = time.monotonic()
+        try:
+            status, reply = _request(
+                conn, "POST", f"/jobs?filename={quote(filename)}", data,
+                {"Content-Type": "application/octet-stream"},
+            )
+            with lock:
+                submit_latency.add(time.monotonic() - started)
+            if status == 503:
+                outcome = "rejected"
+            elif status != 202:
+                outcome = "error"
+            else:
+                while True:
+                    status, job = _request(conn, "GET", reply["status_url"])
+                    if job["status"] in ("done", "failed"):
+                        outcome = job["status"]
+                        break
+                    time.sleep(poll_interval)
+                with lock:
+                    total_latency.add(time.monotonic() - started)
+        except (http.client.HTTPException, OSError):
+            outcome = "error"
+        finally:
+            conn.close()
+        with lock:
+            outcomes[outcome] += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.monotonic() - started
+
+    def fmt(stats):
+        s = stats.as_dict()
+        if not s["count"]:
+            return "n/a"
+        return f"p50 {s['p50']:.3f}s  p95 {s['p95']:.3f}s  max {s['max']:.3f}s"
+
+    print(f"{requests} requests, concurrency {concurrency}, {elapsed:.2f}s "
+          f"({outcomes['done'] / elapsed:.2f} jobs/s)")
+    print(f"Outcomes: {outcomes}")
+    print(f"Submit latency:     {fmt(submit_latency)}")
+    print(f"End-to-end latency: {fmt(total_latency)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WeChat statement analysis service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_cmd = sub.add_parser("serve", help="Run the analysis service")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8000)
+    serve_cmd.add_argument("--workers", type=int, default=2, help="Concurrent analyses")
+    serve_cmd.add_argument("--queue-size", type=int, default=16, help="Max waiting jobs")
+
+    bench_cmd = sub.add_parser("bench", help="Load test a running service")
+    bench_cmd.add_argument("statement", help="Statement file to submit repeatedly")
+    bench_cmd.add_argument("--url", default="http://127.0.0.1:8000")
+    bench_cmd.add_argument("--requests", type=int, default=50)
+    bench_cmd.add_argument("--concurrency", type=int, default=10)
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers, args.queue_size)
+    elif args.command == "bench":
+        if not os.path.exists(args.statement):
+            print(f"Error: file not found: {args.statement}")
+            sys.exit(1)
+        bench(args.url, args.statement, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,21 @@
 import sys
 import os
-import pandas as pd
 import glob
-import pdfplumber
-from openpyxl import Workbook
+import argparse
+import multiprocessing
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout,
                              QWidget, QFileDialog, QTableWidget, QTableWidgetItem,
-                             QLabel, QHBoxLayout, QProgressBar)
+                             QLabel, QHBoxLayout, QProgressBar, QComboBox,
+                             QTabWidget, QSpinBox)
 import matplotlib.pyplot as plt
 
+from pdf_ocr import ocr_available
+from wechat_transactions import (RankingAccumulator, RecurringPaymentDetector,
+                                 TransactionRollup, build_wechat_ranking,
+                                 build_wechat_rollup, collect_statement_files,
+                                 convert_pdf_to_excel, format_ocr_failure,
+                                 iter_wechat_transactions)
+
 
 # 设置matplotlib中文字体
 import platform
@@ -23,98 +30,6 @@ else:
 plt.rcParams["axes.unicode_minus"] = False  # 解决负号显示问题
 
 
-def convert_pdf_to_excel(pdf_path, excel_path=None):
-    """Convert PDF file to Excel spreadsheet."""
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
-    if excel_path is None:
-        excel_path = os.path.splitext(pdf_path)[0] + ".xlsx"
-
-    all_rows = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            page_tables = page.extract_tables()
-            for table in page_tables:
-                if table:
-                    for row in table:
-                        all_rows.append(row)
-
-    if not all_rows:
-        return None
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Tables"
-
-    for row_idx, row in enumerate(all_rows, start=1):
-        for col_idx, value in enumerate(row, start=1):
-            ws.cell(row=row_idx, column=col_idx, value=value)
-
-    wb.save(excel_path)
-    return excel_path
-
-
-def find_header_row(file_path, required_columns):
-    """自动检测表头行的位置"""
-    df = pd.read_excel(file_path, header=None)
-
-    for idx, row in df.iterrows():
-        row_values = [str(v).strip() if pd.notna(v) else "" for v in row.values]
-        matched = 0
-        for col in required_columns:
-            if col in row_values:
-                matched += 1
-        if matched >= 3:  # 匹配至少3个必要列就算找到表头
-            return idx
-
-    return None
-
-
-def process_wechat_statement(file_path):
-    # 自动检测表头行位置
-    required_columns = ["交易时间", "收/支/其他", "金额(元)"]
-
-    header_row = find_header_row(file_path, required_columns)
-    if header_row is None:
-        raise ValueError("未找到微信账单表头行，文件格式可能不正确")
-
-    # 读取Excel文件，从检测到的表头行开始
-    df = pd.read_excel(file_path, header=header_row)
-
-    # 将交易时间列转换为datetime类型
-    df["交易时间"] = pd.to_datetime(df["交易时间"], errors="coerce")
-    # 删除无效的日期
-    df = df.dropna(subset=["交易时间"])
-
-    # 添加月份列
-    df["月份"] = df["交易时间"].dt.strftime("%Y-%m")
-
-    # 将金额(元)列转换为数值类型
-    df["金额(元)"] = pd.to_numeric(df["金额(元)"], errors="coerce")
-    # 删除无效的金额
-    df = df.dropna(subset=["金额(元)"])
-
-    # 确保收支列的值只包含'收入'和'支出'
-    df = df[df["收/支/其他"].isin(["收入", "支出"])]
-
-    # 按收/支/其他类型和月份分组统计
-    monthly_stats = []
-    for month in sorted(df["月份"].unique()):
-        month_data = df[df["月份"] == month]
-
-        # 计算收入和支出
-        income = month_data[month_data["收/支/其他"] == "收入"]["金额(元)"].sum()
-        expense = month_data[month_data["收/支/其他"] == "支出"]["金额(元)"].sum()
-
-        monthly_stats.append(
-            {"月份": month, "收入": income, "支出": expense, "净收入": income - expense}
-        )
-
-    return pd.DataFrame(monthly_stats)
-
-
 class WeChatAnalyzer(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -137,10 +52,18 @@ class WeChatAnalyzer(QMainWindow):
         self.select_dir_btn = QPushButton("选择文件夹", self)
         self.select_dir_btn.clicked.connect(self.select_directory)
 
+        # 统计粒度选择
+        self.granularity_combo = QComboBox(self)
+        self.granularity_combo.addItems(list(TransactionRollup.GRANULARITIES))
+        self.granularity_combo.setCurrentText("月")
+        self.granularity_combo.currentTextChanged.connect(self.change_granularity)
+
         self.status_label = QLabel("请选择PDF文件或文件夹")
 
         top_layout.addWidget(self.select_pdf_btn)
         top_layout.addWidget(self.select_dir_btn)
+        top_layout.addWidget(QLabel("统计粒度:"))
+        top_layout.addWidget(self.granularity_combo)
         top_layout.addWidget(self.status_label)
         layout.addLayout(top_layout)
 
@@ -149,26 +72,95 @@ class WeChatAnalyzer(QMainWindow):
         self.progress_bar.setVisible(False)
         layout.addWidget(self.progress_bar)
 
+        self.tabs = QTabWidget()
+        layout.addWidget(self.tabs)
+
         # 创建表格
         self.table = QTableWidget()
         self.table.setColumnCount(4)
         self.table.setHorizontalHeaderLabels(
             ["月份", "收入(元)", "支出(元)", "净收入(元)"]
         )
-        layout.addWidget(self.table)
-
+        self.tabs.addTab(self.table, "收支统计")
+
+        # 创建支出排行页
+        ranking_widget = QWidget()
+        ranking_layout = QVBoxLayout(ranking_widget)
+        ranking_options = QHBoxLayout()
+
+        self.ranking_dimension_combo = QComboBox(self)
+        self.ranking_dimension_combo.addItems(list(RankingAccumulator.DIMENSIONS))
+        self.ranking_by_combo = QComboBox(self)
+        self.ranking_by_combo.addItems(["金额", "笔数"])
+        self.ranking_top_spin = QSpinBox(self)
+        self.ranking_top_spin.setRange(1, 500)
+        self.ranking_top_spin.setValue(20)
+
+        self.ranking_dimension_combo.currentTextChanged.connect(self.update_ranking_table)
+        self.ranking_by_combo.currentTextChanged.connect(self.update_ranking_table)
+        self.ranking_top_spin.valueChanged.connect(self.update_ranking_table)
+
+        ranking_options.addWidget(QLabel("排行维度:"))
+        ranking_options.addWidget(self.ranking_dimension_combo)
+        ranking_options.addWidget(QLabel("排序:"))
+        ranking_options.addWidget(self.ranking_by_combo)
+        ranking_options.addWidget(QLabel("前N名:"))
+        ranking_options.addWidget(self.ranking_top_spin)
+        ranking_options.addStretch()
+        ranking_layout.addLayout(ranking_options)
+
+        self.ranking_table = QTableWidget()
+        self.ranking_table.setColumnCount(4)
+        self.ranking_table.setHorizontalHeaderLabels(
+            ["排名", "交易对方", "支出(元)", "笔数"]
+        )
+        ranking_layout.addWidget(self.ranking_table)
+        self.tabs.addTab(ranking_widget, "支出排行")
+
+        # 创建周期性支付页
+        self.recurring_table = QTableWidget()
+        self.recurring_table.setColumnCount(len(RecurringPaymentDetector.COLUMNS))
+        self.recurring_table.setHorizontalHeaderLabels(RecurringPaymentDetector.COLUMNS)
+        self.tabs.addTab(self.recurring_table, "周期性支付")
+
+        self.rollup = None
+        self.ranking = None
+        self.recurring = None
         self.final_stats = None
 
+    def change_granularity(self, granularity):
+        if self.rollup is None:
+            return
+        # 各粒度都由预计算的按天汇总推导, 无需重新处理账单
+        self.final_stats = self.rollup.view(granularity)
+        self.update_table()
+
     def select_pdf_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择PDF文件", "", "PDF Files (*.pdf)"
+            self, "选择PDF文件", "", "PDF Files (*.pdf);;CSV Files (*.csv)"
         )
         if file_path:
             try:
-                self.convert_and_process_pdf(file_path)
+                if file_path.lower().endswith(".csv"):
+                    self.process_csv_file(file_path)
+                else:
+                    self.convert_and_process_pdf(file_path)
             except Exception as e:
                 self.status_label.setText(f"处理文件时出错：{str(e)}")
 
+    def process_csv_file(self, csv_path):
+        self.status_label.setText(f"正在处理: {os.path.basename(csv_path)}")
+        QApplication.processEvents()
+
+        # CSV账单直接分块读取, 无需转换为Excel
+        self.ranking = RankingAccumulator()
+        self.recurring = RecurringPaymentDetector()
+        self.rollup = build_wechat_rollup(csv_path, (self.ranking, self.recurring))
+        self.change_granularity(self.granularity_combo.currentText())
+        self.update_ranking_table()
+        self.update_recurring_table()
+        self.status_label.setText(f"处理完成: {os.path.basename(csv_path)}")
+
     def convert_and_process_pdf(self, pdf_path):
         self.status_label.setText(f"正在转换: {os.path.basename(pdf_path)}")
         self.progress_bar.setVisible(True)
@@ -185,11 +177,13 @@ class WeChatAnalyzer(QMainWindow):
             QApplication.processEvents()
 
             # 转换PDF到Excel
-            result = convert_pdf_to_excel(pdf_path, excel_path)
+            failed_pages = []
+            result = convert_pdf_to_excel(pdf_path, excel_path, failed_pages=failed_pages)
             if not result:
-                self.status_label.setText(
-                    f"PDF中未找到表格: {os.path.basename(pdf_path)}"
-                )
+                message = f"PDF中未找到表格: {os.path.basename(pdf_path)}"
+                if not ocr_available():
+                    message += " (扫描件需要安装本地OCR引擎 Tesseract)"
+                self.status_label.setText(message)
                 self.progress_bar.setVisible(False)
                 return
 
@@ -197,14 +191,21 @@ class WeChatAnalyzer(QMainWindow):
             QApplication.processEvents()
 
             # 处理Excel文件
-            stats = process_wechat_statement(excel_path)
+            self.ranking = RankingAccumulator()
+            self.recurring = RecurringPaymentDetector()
+            self.rollup = build_wechat_rollup(excel_path, (self.ranking, self.recurring))
 
             self.progress_bar.setValue(3)
             QApplication.processEvents()
 
-            self.final_stats = stats
-            self.update_table()
-            self.status_label.setText(f"处理完成: {os.path.basename(pdf_path)}")
+            self.change_granularity(self.granularity_combo.currentText())
+            self.update_ranking_table()
+            self.update_recurring_table()
+            message = f"处理完成: {os.path.basename(pdf_path)}"
+            if failed_pages:
+                # OCR失败的页没有交易, 统计结果不完整
+                message += f"; 警告: {format_ocr_failure(pdf_path, failed_pages)}"
+            self.status_label.setText(message)
 
         except Exception as e:
             self.status_label.setText(f"处理文件时出错：{str(e)}")
@@ -220,9 +221,9 @@ class WeChatAnalyzer(QMainWindow):
                 self.status_label.setText(f"处理文件时出错：{str(e)}")
 
     def process_directory(self, dir_path):
-        excel_files = glob.glob(f"{dir_path}/*.xlsx")
+        excel_files = glob.glob(f"{dir_path}/*.xlsx") + glob.glob(f"{dir_path}/*.csv")
         if not excel_files:
-            self.status_label.setText("所选文件夹中没有找到Excel文件")
+            self.status_label.setText("所选文件夹中没有找到Excel或CSV文件")
             return
 
         # 显示进度条并设置初始值
@@ -231,13 +232,14 @@ class WeChatAnalyzer(QMainWindow):
         self.progress_bar.setMaximum(len(excel_files))
         self.progress_bar.setValue(0)
 
-        all_stats = []
+        all_rollups = []
+        ranking = RankingAccumulator()
+        recurring = RecurringPaymentDetector()
         for i, file in enumerate(excel_files, 1):
             try:
                 # 更新状态标签显示当前处理的文件
                 self.status_label.setText(f"正在处理: {os.path.basename(file)}")
-                stats = process_wechat_statement(file)
-                all_stats.append(stats)
+                all_rollups.append(build_wechat_rollup(file, (ranking, recurring)))
                 # 更新进度条
                 self.progress_bar.setValue(i)
                 QApplication.processEvents()  # 确保UI更新
@@ -246,10 +248,13 @@ class WeChatAnalyzer(QMainWindow):
                 self.progress_bar.setVisible(False)
                 return
 
-        if all_stats:
-            self.final_stats = pd.concat(all_stats).groupby("月份").sum().reset_index()
-            self.final_stats = self.final_stats.sort_values("月份")
-            self.update_table()
+        if all_rollups:
+            self.rollup = TransactionRollup.merge(all_rollups)
+            self.ranking = ranking
+            self.recurring = recurring
+            self.change_granularity(self.granularity_combo.currentText())
+            self.update_ranking_table()
+            self.update_recurring_table()
             self.status_label.setText("数据处理完成")
             self.progress_bar.setVisible(False)
 
@@ -266,12 +271,18 @@ class WeChatAnalyzer(QMainWindow):
         avg_expense = self.final_stats["支出"].mean()
         avg_net = self.final_stats["净收入"].mean()
 
+        # 第一列为当前粒度的周期 (日期/周/月份/季度/年份)
+        period_column = self.final_stats.columns[0]
+        self.table.setHorizontalHeaderLabels(
+            [period_column, "收入(元)", "支出(元)", "净收入(元)"]
+        )
+
         # 设置表格行数（原数据行数 + 2行用于显示合计和平均值）
         self.table.setRowCount(len(self.final_stats) + 2)
 
         # 填充数据行
         for i, row in self.final_stats.iterrows():
-            self.table.setItem(i, 0, QTableWidgetItem(str(row["月份"])))
+            self.table.setItem(i, 0, QTableWidgetItem(str(row[period_column])))
             self.table.setItem(i, 1, QTableWidgetItem(f"¥{row['收入']:,.2f}"))
             self.table.setItem(i, 2, QTableWidgetItem(f"¥{row['支出']:,.2f}"))
             self.table.setItem(i, 3, QTableWidgetItem(f"¥{row['净收入']:,.2f}"))
@@ -292,8 +303,122 @@ class WeChatAnalyzer(QMainWindow):
 
         self.table.resizeColumnsToContents()
 
+    def update_ranking_table(self):
+        if self.ranking is None:
+            return
+
+        dimension = self.ranking_dimension_combo.currentText()
+        top = self.ranking.top(
+            dimension, self.ranking_top_spin.value(), by=self.ranking_by_combo.currentText()
+        )
+
+        self.ranking_table.setHorizontalHeaderLabels(["排名", dimension, "支出(元)", "笔数"])
+        self.ranking_table.setRowCount(len(top))
+        for i, row in top.iterrows():
+            self.ranking_table.setItem(i, 0, QTableWidgetItem(str(i + 1)))
+            self.ranking_table.setItem(i, 1, QTableWidgetItem(str(row[dimension])))
+            self.ranking_table.setItem(i, 2, QTableWidgetItem(f"¥{row['金额']:,.2f}"))
+            self.ranking_table.setItem(i, 3, QTableWidgetItem(str(row["笔数"])))
+
+        self.ranking_table.resizeColumnsToContents()
+
+    def update_recurring_table(self):
+        if self.recurring is None:
+            return
+
+        payments = self.recurring.detect()
+        self.recurring_table.setRowCount(len(payments))
+        for i, row in payments.iterrows():
+            values = [
+                str(row["交易对方"]),
+                row["周期"],
+                str(row["次数"]),
+                f"¥{row['平均金额']:,.2f}",
+                row["首次"].strftime("%Y-%m-%d"),
+                row["最近"].strftime("%Y-%m-%d"),
+                row["下次预计"].strftime("%Y-%m-%d"),
+                f"{row['规律度']:.0%}",
+            ]
+            for col, value in enumerate(values):
+                self.recurring_table.setItem(i, col, QTableWidgetItem(value))
+
+        self.recurring_table.resizeColumnsToContents()
+
+
+def run_ranking_cli(argv):
+    parser = argparse.ArgumentParser(
+        prog="analyze_wechat_transactions.py rank",
+        description="统计多个账单中交易对方和交易类型的金额/笔数排行",
+    )
+    parser.add_argument("paths", nargs="+", help="账单文件(PDF/Excel/CSV)或文件夹")
+    parser.add_argument("--top", type=int, default=20, help="显示前N名 (默认20)")
+    parser.add_argument("--by", choices=["金额", "笔数"], default="金额", help="排序依据")
+    parser.add_argument(
+        "--dimension",
+        choices=list(RankingAccumulator.DIMENSIONS),
+        help="只显示一个维度 (默认全部)",
+    )
+    parser.add_argument(
+        "--direction", choices=["支出", "收入"], default="支出", help="统计支出或收入"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        ranking = build_wechat_ranking(collect_statement_files(args.paths), args.direction)
+    except Exception as e:
+        print(f"处理文件时出错：{e}")
+        return 1
+
+    dimensions = [args.dimension] if args.dimension else list(RankingAccumulator.DIMENSIONS)
+    for dimension in dimensions:
+        top = ranking.top(dimension, args.top, by=args.by)
+        print(f"\n{dimension} {args.direction}排行 (按{args.by}, 前{args.top}名)")
+        for i, row in top.iterrows():
+            print(f"{i + 1:>4}  {row[dimension]}  ¥{row['金额']:,.2f}  {row['笔数']}笔")
+    return 0
+
+
+def run_recurring_cli(argv):
+    parser = argparse.ArgumentParser(
+        prog="analyze_wechat_transactions.py recurring",
+        description="检测多个账单中的周期性支付 (订阅、房租等)",
+    )
+    parser.add_argument("paths", nargs="+", help="账单文件(PDF/Excel/CSV)或文件夹")
+    parser.add_argument(
+        "--min-occurrences", type=int, default=3, help="至少出现次数 (默认3)"
+    )
+    args = parser.parse_args(argv)
+
+    detector = RecurringPaymentDetector(min_occurrences=args.min_occurrences)
+    try:
+        for file_path in collect_statement_files(args.paths):
+            for chunk in iter_wechat_transactions(file_path):
+                detector.add(chunk)
+        payments = detector.detect()
+    except Exception as e:
+        print(f"处理文件时出错：{e}")
+        return 1
+
+    print(f"检测到 {len(payments)} 项周期性支付")
+    for _, row in payments.iterrows():
+        print(
+            f"{row['周期']}  {row['交易对方']}  ¥{row['平均金额']:,.2f}  "
+            f"{row['次数']}次  最近 {row['最近']:%Y-%m-%d}  "
+            f"下次预计 {row['下次预计']:%Y-%m-%d}  规律度 {row['规律度']:.0%}"
+        )
+    return 0
+
 
 def main():
+    # 打包后的程序里OCR进程池的子进程也从这里启动, 需先交给multiprocessing处理
+    multiprocessing.freeze_support()
+
+    # 带子命令时以命令行方式运行, 否则启动图形界面
+    if len(sys.argv) > 1 and sys.argv[1] == "rank":
+        sys.exit(run_ranking_cli(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "recurring":
+        sys.exit(run_recurring_cli(sys.argv[2:]))
+
     app = QApplication(sys.argv)
     window = WeChatAnalyzer()
     window.show()
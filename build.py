@@ -160,7 +160,7 @@ jobs:
       - name: Install dependencies
         run: |
           python -m pip install --upgrade pip
-          pip install pyinstaller pyqt6 pandas matplotlib openpyxl pdfplumber
+          pip install pyinstaller pyqt6 pandas matplotlib openpyxl pdfplumber pytesseract
 
       - name: Build on macOS
         if: runner.os == 'macOS'
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Form Replay
+
+Records the HTTP request the web form produces once (through the browser),
+then submits the remaining records as direct HTTP requests over pooled
+keep-alive connections, without rendering the form for every record.
+Outcomes go to the same journal as `luru.py batch`, so both modes can
+resume each other's runs. The capture really submits the first record, so
+it is journaled too and replay does not send it again.
+
+A submission only counts as ok when the response contains the success
+marker (--expect, stored in the template at capture time). When the
+request was sent but no answer came back, or the answer cannot be
+confirmed, the record is journaled as "unknown" and never resent
+automatically.
+
+Dependencies:
+    pip install selenium        # only needed for capture
+
+Usage:
+    python form_replay.py capture records.csv template.json --expect TEXT
+    python form_replay.py replay template.json records.csv [--workers 8]
+    python form_replay.py mock [--port 8765]
+
+Examples:
+    # Verify a template against a local mock server instead of the real site
+    python form_replay.py mock --port 8765
+    python form_replay.py replay template.json records.csv \\
+        --url http://127.0.0.1:8765/submit --expect success
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import select
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote_plus, urlsplit
+
+from job_journal import (
+    JobJournal, UncertainOutcome, format_summary, load_records, record_key, run_batch,
+)
+
+# Captured responses are cut to this many characters
+RESPONSE_EXCERPT = 2000
+
+
+# Installed into the page before submitting, records every XHR/fetch request
+CAPTURE_HOOK = """
+window.__wxlsCaptured = [];
+(function () {
+    var open = XMLHttpRequest.prototype.open;
+    var setHeader = XMLHttpRequest.prototype.setRequestHeader;
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.__wxls = {method: method.toUpperCase(),
+                       url: new URL(url, location.href).href, headers: {}};
+        return open.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.setRequestHeader = function (name, value) {
+        if (this.__wxls) { this.__wxls.headers[name] = value; }
+        return setHeader.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.send = function (body) {
+        var entry = this.__wxls;
+        if (entry) {
+            entry.body = body == null ? "" : String(body);
+            window.__wxlsCaptured.push(entry);
+            this.addEventListener("load", function () {
+                entry.status = this.status;
+                try {
+                    entry.response = String(this.responseText).slice(0, %(excerpt)d);
+                } catch (e) {
+                    entry.response = "";
+                }
+            });
+        }
+        return send.apply(this, arguments);
+    };
+    var originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function (input, init) {
+            init = init || {};
+            var headers = {};
+            new Headers(init.headers || {}).forEach(function (value, name) {
+                headers[name] = value;
+            });
+            var entry = {
+                method: (init.method || "GET").toUpperCase(),
+                url: new URL(typeof input === "string" ? input : input.url,
+                             location.href).href,
+                headers: headers,
+                body: init.body == null ? "" : String(init.body)
+            };
+            window.__wxlsCaptured.push(entry);
+            var result = originalFetch.apply(this, arguments);
+            result.then(function (response) {
+                response.clone().text().then(function (text) {
+                    entry.status = response.status;
+                    entry.response = text.slice(0, %(excerpt)d);
+                });
+            }, function () {});
+            return result;
+        };
+    }
+})();
+""" % {"excerpt": RESPONSE_EXCERPT}
+
+# Headers recomputed per request rather than replayed verbatim
+SKIP_HEADERS = {"content-length", "host", "connection", "accept-encoding"}
+
+ENCODERS = {
+    "raw": lambda value: value,
+    "json": lambda value: json.dumps(value, ensure_ascii=False)[1:-1],
+    "json-ascii": lambda value: json.dumps(value)[1:-1],
+    "form": quote_plus,
+}
+
+
+def make_template(request, record, cookies=(), expect=None):
+    """
+    Turn a captured request into a replay template.
+
+    Every record value found in the request body is replaced by a
+    {{field}} placeholder, remembering how it was encoded; today's date
+    becomes {{today}}. Values should be distinctive in the capture record.
+    expect is the text a successful response contains; it is stored in
+    the template so replay can confirm every submission.
+    """
+    body = request["body"]
+    content_type = " ".join(
+        value.lower()
+        for name, value in request["headers"].items()
+        if name.lower() == "content-type"
+    )
+    if "json" in content_type:
+        # ASCII values look the same either way; an all-ASCII body means the
+        # page escapes non-ASCII text, so later records must be escaped too
+        encodings = ["json-ascii", "json"] if body.isascii() else ["json", "json-ascii"]
+    elif "x-www-form-urlencoded" in content_type:
+        encodings = ["form"]
+    else:
+        encodings = ["raw", "form"]
+
+    fields = {}
+    # Longest values first so "111" does not match inside "111111"
+    for field, value in sorted(record.items(), key=lambda kv: -len(kv[1] or "")):
+        if field == "id" or not value:
+            continue
+        for encoding in encodings:
+            encoded = ENCODERS[encoding](value)
+            if encoded in body:
+                body = body.replace(encoded, "{{%s}}" % field)
+                fields[field] = encoding
+                break
+        else:
+            print(f"Warning: value of '{field}' not found in captured request")
+
+    today = datetime.date.today().isoformat()
+    if today in body:
+        body = body.replace(today, "{{today}}")
+
+    headers = {
+        name: value
+        for name, value in request["headers"].items()
+        if name.lower() not in SKIP_HEADERS
+    }
+    if cookies:
+        headers["Cookie"] = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+
+    response = request.get("response")
+    if expect and response is not None and expect not in response:
+        print(f"Warning: the captured response does not contain {expect!r}")
+
+    return {
+        "method": request["method"],
+        "url": request["url"],
+        "headers": headers,
+        "body": body,
+        "fields": fields,
+        "expect": expect,
+    }
+
+
+def render_body(template, record):
+    """Fill a template's placeholders with one record's values."""
+    body = template["body"].replace("{{today}}", datetime.date.today().isoformat())
+    for field, encoding in template["fields"].items():
+        body = body.replace("{{%s}}" % field, ENCODERS[encoding](record[field]))
+    return body
+
+
+def capture_template(record, journal=None, expect=None, success_xpath=None):
+    """
+    Fill and submit the form once in a browser and capture its request.
+
+    The submission is real; with a journal, its outcome is recorded there
+    like any other record so replay skips it. success_xpath overrides the
+    browser-side success marker of luru.submit_form.
+    """
+    from selenium import webdriver
+    from luru import SUCCESS_XPATH, fill_form, submit_form
+
+    key = record_key(record)
+    run_id = uuid.uuid4().hex
+
+    def journal_outcome(status, error=None):
+        if journal:
+            entry = {"type": "record", "key": key, "status": status,
+                     "attempts": 1, "run_id": run_id}
+            if error:
+                entry["error"] = error
+            journal.append(entry)
+
+    driver = webdriver.Chrome()
+    driver.implicitly_wait(30)
+    try:
+        fill_form(driver, record)
+        driver.execute_script(CAPTURE_HOOK)
+        if journal:
+            journal.append({"type": "attempt", "key": key, "attempt": 1, "run_id": run_id})
+        try:
+            submit_form(driver, success_xpath or SUCCESS_XPATH)
+        except UncertainOutcome as e:
+            journal_outcome("unknown", f"{type(e).__name__}: {e}")
+        except Exception as e:
+            journal_outcome("failed", f"{type(e).__name__}: {e}")
+            raise
+        else:
+            journal_outcome("ok")
+
+        # Wait for the request and, if it arrives in time, its response
+        deadline = time.monotonic() + 30
+        requests = []
+        while time.monotonic() < deadline:
+            requests = [
+                r for r in driver.execute_script("return window.__wxlsCaptured;")
+                if r["method"] != "GET"
+            ]
+            if requests and "response" in requests[-1]:
+                break
+            time.sleep(0.5)
+        if not requests:
+            raise RuntimeError("No form submission request captured")
+
+        request = requests[-1]
+        if "response" in request:
+            print(f"Captured response (HTTP {request.get('status')}): "
+                  f"{request['response'][:200]}")
+        return make_template(request, record, driver.get_cookies(), expect)
+    finally:
+        driver.quit()
+
+
+class ReplaySession:
+    """
+    Submits rendered templates over one keep-alive connection per thread.
+
+    Errors before the request is written (connecting, a closed keep-alive
+    connection) are ordinary failures and may be retried. Anything that
+    goes wrong after it was written, and any 2xx/3xx answer that cannot be
+    confirmed with the expect marker, raises UncertainOutcome, since the
+    server may already have accepted the record.
+    """
+
+    def __init__(self, template, url=None, timeout=30, expect=None):
+        self.template = template
+        parts = urlsplit(url or template["url"])
+        self.connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path += "?" + parts.query
+        self.timeout = timeout
+        self.expect = expect if expect is not None else template.get("expect")
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        # A keep-alive connection the server has since closed reads as ready
+        # (EOF); reconnect instead of sending into it
+        if conn is not None and conn.sock is not None:
+            if select.select([conn.sock], [], [], 0)[0]:
+                self._reset()
+                conn = None
+        if conn is None:
+            conn = self.connection_class(self.netloc, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def submit(self, record):
+        body = render_body(self.template, record).encode("utf-8")
+        conn = self._connection()
+        try:
+            conn.request(
+                self.template["method"], self.path, body, self.template["headers"]
+            )
+        except (http.client.HTTPException, OSError):
+            # Nothing complete reached the server, retrying is safe
+            self._reset()
+            raise
+        try:
+            response = conn.getresponse()
+            data = response.read()
+        except Exception as e:
+            self._reset()
+            raise UncertainOutcome(f"No response after sending: {type(e).__name__}: {e}") from e
+        if response.will_close:
+            self._reset()
+
+        if response.status >= 400:
+            raise RuntimeError(f"HTTP {response.status}: {data[:200]!r}")
+        if not self.expect:
+            raise UncertainOutcome(
+                f"HTTP {response.status} without a success marker to check: {data[:200]!r}"
+            )
+        if self.expect not in data.decode("utf-8", "replace"):
+            raise RuntimeError(f"Unexpected response: {data[:200]!r}")
+
+
+class MockFormHandler(BaseHTTPRequestHandler):
+    """Accepts any submission and answers like a successful form backend."""
+
+    protocol_version = "HTTP/1.1"
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        with self.lock:
+            MockFormHandler.received += 1
+        payload = json.dumps({"code": 200, "msg": "success"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_PUT = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_mock(port):
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockFormHandler)
+    print(f"Mock form server listening on http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Received {MockFormHandler.received} submissions")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Capture the form's HTTP request once, then replay it per record"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    capture = sub.add_parser("capture", help="Capture a template with the browser")
+    capture.add_argument("records", help="CSV records; the first one is submitted")
+    capture.add_argument("template", help="Output template JSON file")
+    capture.add_argument("--journal", help="Journal path (default: <records>.journal.jsonl)")
+    capture.add_argument("--expect", required=True,
+                         help="Text every successful response contains (stored in the template)")
+    capture.add_argument("--success-xpath",
+                         help="Element the page shows after a successful submission")
+
+    replay = sub.add_parser("replay", help="Submit records over HTTP")
+    replay.add_argument("template", help="Template JSON file from capture")
+    replay.add_argument("records", help="CSV records")
+    replay.add_argument("--journal", help="Journal path (default: <records>.journal.jsonl)")
+    replay.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+    replay.add_argument("--retries", type=int, default=2, help="Retries per record")
+    replay.add_argument("--backoff", type=float, default=1.0, help="First retry delay (s)")
+    replay.add_argument("--url", help="Override the target URL (e.g. a mock server)")
+    replay.add_argument("--expect",
+                        help="Text a successful response must contain (default: from template)")
+    replay.add_argument("--resubmit-unknown", action="store_true",
+                        help="Resubmit records whose earlier outcome is unconfirmed")
+
+    mock = sub.add_parser("mock", help="Run a local mock form server")
+    mock.add_argument("--port", type=int, default=8765)
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "capture":
+            records = load_records(args.records)
+            if not records:
+                raise ValueError(f"No records in {args.records}")
+            with JobJournal(args.journal or args.records + ".journal.jsonl") as journal:
+                template = capture_template(
+                    records[0], journal, args.expect, args.success_xpath
+                )
+            with open(args.template, "w", encoding="utf-8") as f:
+                json.dump(template, f, ensure_ascii=False, indent=2)
+            print(f"Captured {template['method']} {template['url']} -> {args.template}")
+            print(f"Fields: {', '.join(template['fields']) or '(none)'}")
+
+        elif args.command == "replay":
+            with open(args.template, encoding="utf-8") as f:
+                template = json.load(f)
+            session = ReplaySession(template, url=args.url, expect=args.expect)
+            if not session.expect:
+                raise ValueError(
+                    "Replay needs a success marker: pass --expect or set "
+                    "\"expect\" in the template"
+                )
+            summary = run_batch(
+                load_records(args.records),
+                session.submit,
+                args.journal or args.records + ".journal.jsonl",
+                retries=args.retries,
+                backoff=args.backoff,
+                workers=args.workers,
+                resubmit_in_doubt=args.resubmit_unknown,
+            )
+            print(format_summary(summary))
+            if summary["failed"] or summary["in_doubt_keys"]:
+                sys.exit(1)
+
+        elif args.command == "mock":
+            serve_mock(args.port)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
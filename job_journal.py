@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Batch Job Journal
+
+Append-only journal of per-record outcomes for the form-filling jobs
+(see luru.py). Every finished record is written to the journal as soon as
+it completes, so a crashed or cancelled run can be restarted: records that
+already succeeded are skipped and only failed or unfinished ones are retried.
+
+An "attempt" entry is written before every submission. A record whose last
+entry is an attempt (the run died mid-submit) or whose outcome could not be
+confirmed may already have reached the site, so reruns flag it as in doubt
+instead of submitting it again, unless resubmitting is explicitly requested.
+
+Journal format (one JSON object per line):
+    {"type": "attempt", "key": "...", "attempt": 1, "run_id": "..."}
+    {"type": "record", "key": "...", "status": "ok", "attempts": 1, ...}
+    {"type": "record", "key": "...", "status": "failed", "error": "...", ...}
+    {"type": "record", "key": "...", "status": "unknown", "error": "...", ...}
+    {"type": "run", "run_id": "...", "succeeded": 10, "failed": 1, ...}
+
+Usage:
+    from job_journal import load_records, run_batch
+
+    records = load_records("records.csv")
+    summary = run_batch(records, submit, "records.journal.jsonl", retries=2)
+"""
+
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class UncertainOutcome(Exception):
+    """Raised by submit callables when a submission may have reached the site
+    but its result could not be confirmed; such records are never retried."""
+
+
+def load_records(csv_path):
+    """Load batch records from a CSV file (one record per row)."""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Records file not found: {csv_path}")
+
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        return [dict(row) for row in csv.DictReader(f)]
+
+
+def record_key(record):
+    """Stable identity of a record: its "id" column, or a hash of its content."""
+    if record.get("id"):
+        return str(record["id"])
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class JobJournal:
+    """Append-only JSON-lines journal of record outcomes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.status = {}
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                valid_size += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._track(entry)
+        # A crash mid-write leaves a truncated last line; drop it so the next
+        # entry does not get glued onto it
+        if valid_size != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+
+    def _track(self, entry):
+        if entry.get("type") == "record":
+            self.status[entry["key"]] = entry["status"]
+        elif entry.get("type") == "attempt":
+            self.status[entry["key"]] = "attempt"
+
+    def is_done(self, key):
+        return self.status.get(key) == "ok"
+
+    def in_doubt(self, key):
+        """True when a previous submission of the record may have gone through."""
+        return self.status.get(key) in ("attempt", "unknown")
+
+    def append(self, entry):
+        # Worker threads write attempt entries while the main thread writes outcomes
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._track(entry)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _submit_with_retries(record, submit, retries, backoff, backoff_factor,
+                         max_backoff, before_attempt=None):
+    """
+    Submit one record, retrying failures.
+
+    Returns:
+        (status, attempts, error, elapsed) with status "ok", "failed" or
+        "unknown" (submit raised UncertainOutcome)
+    """
+    delay = backoff
+    for attempt in range(1, retries + 2):
+        if before_attempt:
+            before_attempt(attempt)
+        started = time.monotonic()
+        try:
+            submit(record)
+        except UncertainOutcome as e:
+            # Retrying could submit the record twice
+            return "unknown", attempt, f"{type(e).__name__}: {e}", time.monotonic() - started
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt <= retries:
+                time.sleep(delay)
+                delay = min(delay * backoff_factor, max_backoff)
+                continue
+            return "failed", attempt, error, time.monotonic() - started
+        return "ok", attempt, None, time.monotonic() - started
+
+
+def _run_pool(pending, attempt, finish, workers):
+    """
+    Run attempts on a thread pool with at most `workers` records in flight.
+
+    Records are handed to the pool only as slots free up, so an interrupt
+    cancels nothing but the few records already running; their outcomes
+    are still journaled before the interrupt propagates.
+    """
+    queue = iter(pending)
+    in_flight = {}
+    pool = ThreadPoolExecutor(max_workers=workers)
+
+    def refill():
+        while len(in_flight) < workers:
+            item = next(queue, None)
+            if item is None:
+                return
+            key, record = item
+            in_flight[pool.submit(attempt, key, record)] = key
+
+    try:
+        refill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            # The journal's outcome entries are only written from this thread
+            for future in done:
+                finish(in_flight.pop(future), future.result())
+            refill()
+    except KeyboardInterrupt:
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future, key in in_flight.items():
+            if not future.cancelled() and future.exception() is None:
+                finish(key, future.result())
+        raise
+    finally:
+        pool.shutdown(wait=True)
+
+
+def run_batch(records, submit, journal_path, retries=2, backoff=1.0,
+              backoff_factor=2.0, max_backoff=60.0, workers=1,
+              resubmit_in_doubt=False):
+    """
+    Submit every record not yet marked as done in the journal.
+
+    Records whose previous submission may have gone through (see
+    JobJournal.in_doubt) are skipped and listed in summary["in_doubt_keys"]
+    unless resubmit_in_doubt is set, e.g. after checking them on the site.
+
+    Args:
+        records: Iterable of record dicts
+        submit: Callable taking one record; raising means the attempt failed
+        journal_path: Path to the journal file (created if missing)
+        retries: Extra attempts per record after the first failure
+        backoff: Delay in seconds before the first retry
+        backoff_factor: Multiplier applied to the delay after each retry
+        max_backoff: Upper bound for the retry delay
+        workers: Number of records submitted concurrently (submit must be
+            thread-safe when greater than 1)
+        resubmit_in_doubt: Submit in-doubt records again instead of skipping
+
+    Returns:
+        Run summary dict (counts, elapsed time, throughput and error rate)
+    """
+    summary = {
+        "type": "run",
+        "run_id": uuid.uuid4().hex,
+        "started": time.time(),
+        "total": 0,
+        "skipped": 0,
+        "succeeded": 0,
+        "failed": 0,
+        "unknown": 0,
+        "in_doubt": 0,
+        "in_doubt_keys": [],
+        "attempts": 0,
+        "workers": workers,
+        "interrupted": False,
+    }
+    started = time.monotonic()
+
+    def attempt(key, record):
+        def before_attempt(number):
+            journal.append({
+                "type": "attempt", "key": key, "attempt": number,
+                "run_id": summary["run_id"],
+            })
+        return _submit_with_retries(
+            record, submit, retries, backoff, backoff_factor, max_backoff,
+            before_attempt,
+        )
+
+    def finish(key, result):
+        status, attempts, error, elapsed = result
+        summary["attempts"] += attempts
+        summary[{"ok": "succeeded", "failed": "failed", "unknown": "unknown"}[status]] += 1
+        if status == "unknown":
+            summary["in_doubt_keys"].append(key)
+        entry = {
+            "type": "record",
+            "key": key,
+            "status": status,
+            "attempts": attempts,
+            "elapsed": elapsed,
+            "run_id": summary["run_id"],
+        }
+        if error:
+            entry["error"] = error
+        journal.append(entry)
+
+    with JobJournal(journal_path) as journal:
+        try:
+            pending = []
+            for record in records:
+                summary["total"] += 1
+                key = record_key(record)
+                if journal.is_done(key):
+                    summary["skipped"] += 1
+                elif journal.in_doubt(key) and not resubmit_in_doubt:
+                    summary["in_doubt"] += 1
+                    summary["in_doubt_keys"].append(key)
+                else:
+                    pending.append((key, record))
+
+            if workers <= 1:
+                for key, record in pending:
+                    finish(key, attempt(key, record))
+            else:
+                _run_pool(pending, attempt, finish, workers)
+        except KeyboardInterrupt:
+            summary["interrupted"] = True
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            processed = summary["succeeded"] + summary["failed"] + summary["unknown"]
+            summary["elapsed"] = elapsed
+            summary["throughput"] = summary["succeeded"] / elapsed if elapsed else 0.0
+            summary["error_rate"] = summary["failed"] / processed if processed else 0.0
+            journal.append(summary)
+
+    return summary
+
+
+def format_summary(summary):
+    """Human readable run summary (one line, plus in-doubt records if any)."""
+    text = (
+        f"Run {summary['run_id'][:8]}: "
+        f"{summary['succeeded']} ok, {summary['failed']} failed, "
+        f"{summary['skipped']} skipped of {summary['total']} records "
+        f"in {summary['elapsed']:.1f}s "
+        f"({summary['throughput']:.2f} records/s, "
+        f"error rate {summary['error_rate']:.1%})"
+    )
+    if summary["in_doubt_keys"]:
+        text += (
+            f"\n{len(summary['in_doubt_keys'])} records may already have been "
+            f"submitted, check them before resubmitting: "
+            + ", ".join(summary["in_doubt_keys"])
+        )
+    return text
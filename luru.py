@@ -1,11 +1,211 @@
 # -*- coding: utf-8 -*-
 
+import argparse
+import sys
+
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 from selenium.common.exceptions import NoAlertPresentException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 import unittest
 
+from job_journal import UncertainOutcome, format_summary, load_records, run_batch
+
+
+FORM_URL = "https://credit.yn.gov.cn/el.html?c=2fIIrxi5fxK#/form?ssc=2fIIrxi5fxK"
+# 录制脚本先打开带useData参数的地址再进入表单, 保留这一步以触发单页应用重新路由
+PRELOAD_URL = FORM_URL + "&useData=1742990588087"
+
+# 提交后页面出现该元素才算网站已受理。该提示文字未在目标网站上核实过, 批量录入前
+# 先手动提交一条, 确认成功页面的实际提示并用 --success-xpath 指定; 提示对不上时每条
+# 记录都会因无法确认而记为 unknown, 且不会重试
+SUCCESS_XPATH = "//*[contains(text(), '提交成功')]"
+SUCCESS_TIMEOUT = 30
+
+# 默认录入数据, 批量模式下每条记录按表单字段id提供相同的键
+DEFAULT_RECORD = {
+    "zf_name": "111",
+    "sjjyxx_daaress": "111111",
+    "uname": "哈哈",
+    "legal_phone": "15287425299",
+}
+
+
+def fill_form(driver, record, submit=False, success_xpath=SUCCESS_XPATH):
+    driver.get(PRELOAD_URL)
+    driver.get(FORM_URL)
+    # 只改变#后的路由不会重新加载页面, 强制刷新以免上一条记录的表单状态残留
+    driver.refresh()
+    driver.find_element(
+        By.XPATH,
+        "//div[@id='is_jrjgzf']/div[2]/div/div/div/div/div/div/div[2]/span",
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='61912af3-d56d-4188-dadb-9703c0d539c3']/ul/li[2]"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='jrjg_name']/div[2]/div/div/div/div/div/div"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='977d4f65-e10e-42d4-9703-4e2913da6247']/ul/li[9]/span"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='zf_name']/div[2]/div/div/div/input"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='zf_name']/div[2]/div/div/div/input"
+    ).clear()
+    driver.find_element(
+        By.XPATH, "//div[@id='zf_name']/div[2]/div/div/div/input"
+    ).send_keys(record["zf_name"])
+    driver.find_element(
+        By.XPATH, "//div[@id='zf_time']/div[2]/div/div/div/span/div/input"
+    ).click()
+    driver.find_element(By.LINK_TEXT, "今天").click()
+    driver.find_element(
+        By.XPATH, "//div[@id='qygthnm_ztlb']/div[2]/div/div/div/div/div/div"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='9b794fa1-4681-4d83-fca4-a1f2a6371d48']/ul/li[2]"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='id_1745291391588']/div/div/div"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='be1a4667-cdf0-4ba3-f5b8-19ddf0e157f8']/ul/li[2]"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='id_1745291391590']/div/div/div/div"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='55486b77-05ed-4623-8e0b-065facde6b97']/ul/li[8]"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='sjjyxx_daaress']/div[2]/div/div/div/div/textarea"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='sjjyxx_daaress']/div[2]/div/div/div/div/textarea"
+    ).clear()
+    driver.find_element(
+        By.XPATH, "//div[@id='sjjyxx_daaress']/div[2]/div/div/div/div/textarea"
+    ).send_keys(record["sjjyxx_daaress"])
+    driver.find_element(
+        By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
+    ).clear()
+    driver.find_element(
+        By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
+    ).send_keys(record["uname"])
+    driver.find_element(
+        By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
+    ).click()
+    driver.find_element(
+        By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
+    ).clear()
+    driver.find_element(
+        By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
+    ).send_keys(record["legal_phone"])
+    driver.find_element(
+        By.XPATH, "//div[@id='app']/div/div[3]/div/div/label/span/input"
+    ).click()
+    if submit:
+        submit_form(driver, success_xpath)
+
+
+def submit_form(driver, success_xpath=SUCCESS_XPATH, timeout=SUCCESS_TIMEOUT):
+    """点击提交并等待成功提示; 点击之后出现的任何错误都无法确定是否已提交."""
+    driver.find_element(By.XPATH, "//button[@type='button']").click()
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((By.XPATH, success_xpath))
+        )
+    except Exception as e:
+        # 包括等待超时, 以及浏览器或驱动在等待期间崩溃
+        raise UncertainOutcome(f"点击提交后未确认成功: {type(e).__name__}: {e}") from e
+
+
+def start_driver():
+    driver = webdriver.Chrome()
+    driver.implicitly_wait(30)
+    return driver
+
+
+class BrowserSession:
+    """批量录入用的浏览器; 浏览器崩溃或会话失效后, 下一次提交自动重新启动."""
+
+    def __init__(self, success_xpath=SUCCESS_XPATH):
+        self.success_xpath = success_xpath
+        self.driver = None
+
+    def alive(self):
+        try:
+            self.driver.current_url
+        except Exception:
+            return False
+        return True
+
+    def submit(self, record):
+        if self.driver is None:
+            self.driver = start_driver()
+        try:
+            fill_form(self.driver, record, submit=True, success_xpath=self.success_xpath)
+        except Exception:
+            if not self.alive():
+                self.close()
+            raise
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+
+def run_batch_job(argv):
+    parser = argparse.ArgumentParser(
+        description="批量录入: 按CSV逐条提交表单, 中断后重跑只补提交未完成的记录"
+    )
+    parser.add_argument("records", help="CSV文件, 列名为表单字段id (可选 id 列)")
+    parser.add_argument(
+        "--journal", help="日志文件路径 (默认: <records>.journal.jsonl)"
+    )
+    parser.add_argument("--retries", type=int, default=2, help="失败重试次数")
+    parser.add_argument("--backoff", type=float, default=2.0, help="首次重试等待秒数")
+    parser.add_argument(
+        "--resubmit-unknown", action="store_true",
+        help="重新提交结果未确认的记录 (请先在网站上核实它们未被受理)",
+    )
+    parser.add_argument(
+        "--success-xpath", default=SUCCESS_XPATH,
+        help="提交成功后页面出现的元素 (默认值未经核实, 使用前请对照网站的成功提示修改)",
+    )
+    args = parser.parse_args(argv)
+
+    journal_path = args.journal or args.records + ".journal.jsonl"
+    records = load_records(args.records)
+
+    session = BrowserSession(args.success_xpath)
+    try:
+        summary = run_batch(
+            records,
+            session.submit,
+            journal_path,
+            retries=args.retries,
+            backoff=args.backoff,
+            resubmit_in_doubt=args.resubmit_unknown,
+        )
+    finally:
+        session.close()
+
+    print(format_summary(summary))
+    return 1 if summary["failed"] or summary["in_doubt_keys"] else 0
+
 
 class AppDynamicsJob(unittest.TestCase):
     def setUp(self):
@@ -18,108 +218,7 @@ class AppDynamicsJob(unittest.TestCase):
         self.accept_next_alert = True
 
     def test_app_dynamics_job(self):
-        driver = self.driver
-        driver.get(
-            "https://credit.yn.gov.cn/el.html?c=2fIIrxi5fxK#/form?ssc=2fIIrxi5fxK&useData=1742990588087"
-        )
-        driver.get(
-            "https://credit.yn.gov.cn/el.html?c=2fIIrxi5fxK#/form?ssc=2fIIrxi5fxK"
-        )
-        driver.find_element(
-            By.XPATH,
-            "//div[@id='is_jrjgzf']/div[2]/div/div/div/div/div/div/div[2]/span",
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='61912af3-d56d-4188-dadb-9703c0d539c3']/ul/li[2]"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='jrjg_name']/div[2]/div/div/div/div/div/div"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='977d4f65-e10e-42d4-9703-4e2913da6247']/ul/li[9]/span"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='zf_name']/div[2]/div/div/div/input"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='zf_name']/div[2]/div/div/div/input"
-        ).clear()
-        driver.find_element(
-            By.XPATH, "//div[@id='zf_name']/div[2]/div/div/div/input"
-        ).send_keys("111")
-        driver.find_element(
-            By.XPATH, "//div[@id='zf_time']/div[2]/div/div/div/span/div/input"
-        ).click()
-        driver.find_element(By.LINK_TEXT, "今天").click()
-        driver.find_element(
-            By.XPATH, "//div[@id='qygthnm_ztlb']/div[2]/div/div/div/div/div/div"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='9b794fa1-4681-4d83-fca4-a1f2a6371d48']/ul/li[2]"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='id_1745291391588']/div/div/div"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='be1a4667-cdf0-4ba3-f5b8-19ddf0e157f8']/ul/li[2]"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='id_1745291391590']/div/div/div/div"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='55486b77-05ed-4623-8e0b-065facde6b97']/ul/li[8]"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='sjjyxx_daaress']/div[2]/div/div/div/div/textarea"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='sjjyxx_daaress']/div[2]/div/div/div/div/textarea"
-        ).clear()
-        driver.find_element(
-            By.XPATH, "//div[@id='sjjyxx_daaress']/div[2]/div/div/div/div/textarea"
-        ).send_keys("111111")
-        driver.find_element(
-            By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
-        ).clear()
-        driver.find_element(
-            By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
-        ).send_keys("111111")
-        driver.find_element(
-            By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
-        ).click()
-        driver.find_element(
-            By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
-        ).clear()
-        driver.find_element(
-            By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
-        ).send_keys("111111111")
-        driver.find_element(
-            By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
-        ).click()
-        driver.find_element(By.ID, "uname").click()
-        driver.find_element(
-            By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
-        ).clear()
-        driver.find_element(
-            By.XPATH, "//div[@id='uname']/div[2]/div/div/div/input"
-        ).send_keys("哈哈")
-        driver.find_element(
-            By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
-        ).click()
-        driver.find_element(By.ID, "legal_phone").click()
-        driver.find_element(
-            By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
-        ).clear()
-        driver.find_element(
-            By.XPATH, "//div[@id='legal_phone']/div[2]/div/div/div/input"
-        ).send_keys("15287425299")
-        driver.find_element(
-            By.XPATH, "//div[@id='app']/div/div[3]/div/div/label/span/input"
-        ).click()
-        # driver.find_element(By.XPATH,"//button[@type='button']").click()
+        fill_form(self.driver, DEFAULT_RECORD)
 
     def is_element_present(self, how, what):
         try:
@@ -154,4 +253,6 @@ class AppDynamicsJob(unittest.TestCase):
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(run_batch_job(sys.argv[2:]))
     unittest.main()
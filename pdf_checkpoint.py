@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Checkpointed PDF Table Extraction
+
+Extracts table rows page batch by page batch and appends each finished
+batch to a sidecar checkpoint file. If a conversion crashes or is
+cancelled, the next run over the same PDF resumes after the last completed
+batch and returns exactly the rows an uninterrupted run would.
+
+The extraction backend (see pdf_backends.py) is recorded in the header, so
+a resumed run keeps using the backend the first run chose. Pages without a
+text layer are sent to the OCR fallback (see pdf_ocr.py) when available.
+A batch with a page whose OCR failed is not checkpointed (nor is anything
+after it), so a rerun tries those pages again.
+
+Checkpoint format (one JSON object per line):
+    {"type": "header", "fingerprint": {...}, "backend": "tables", "ocr": true}
+    {"type": "batch", "start": 0, "end": 50, "rows": [[...], ...]}
+
+Dependencies:
+    pip install pdfplumber
+"""
+
+import hashlib
+import json
+import os
+
+import pdfplumber
+
+from pdf_backends import REFERENCE_BACKEND, make_extractor, resolve_backend
+from pdf_ocr import OcrFallback, needs_ocr, ocr_available
+
+
+def pdf_fingerprint(pdf_path, page_count):
+    """Identify a PDF by content so a checkpoint is never applied to another file."""
+    digest = hashlib.sha1()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {
+        "size": os.path.getsize(pdf_path),
+        "sha1": digest.hexdigest(),
+        "pages": page_count,
+    }
+
+
+def load_checkpoint(checkpoint_path, fingerprint, backend="auto", ocr=False):
+    """
+    Read completed batches from a checkpoint file.
+
+    Returns:
+        (rows, next_page, valid_size, backend): rows of the completed
+        batches, the first page still to extract, the byte length of the
+        valid part of the file (anything after it is a torn write) and the
+        backend that produced them. Returns ([], 0, 0, None) when there is
+        no usable checkpoint for this PDF, backend and OCR setting.
+    """
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return [], 0, 0, None
+
+    rows = []
+    next_page = 0
+    valid_size = 0
+    used_backend = None
+    with open(checkpoint_path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if valid_size == 0:
+                if entry.get("type") != "header" or entry.get("fingerprint") != fingerprint:
+                    return [], 0, 0, None
+                used_backend = entry.get("backend", REFERENCE_BACKEND)
+                # Rows from another backend could differ, start over instead of mixing
+                if backend != "auto" and used_backend != backend:
+                    return [], 0, 0, None
+                if entry.get("ocr", False) != ocr:
+                    return [], 0, 0, None
+            elif entry.get("type") != "batch" or entry.get("start") != next_page:
+                break
+            else:
+                rows.extend(entry["rows"])
+                next_page = entry["end"]
+            valid_size += len(line)
+
+    return rows, next_page, valid_size, used_backend
+
+
+def discard_checkpoint(checkpoint_path):
+    """Remove a checkpoint once its conversion has been written out."""
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def _append(f, entry):
+    f.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def extract_rows_checkpointed(pdf_path, checkpoint_path=None, batch_size=50,
+                              progress=None, backend=REFERENCE_BACKEND, ocr=True,
+                              ocr_workers=None, failed_pages=None):
+    """
+    Extract all table rows from a PDF, resuming from a checkpoint if present.
+
+    Args:
+        pdf_path: Path to input PDF file
+        checkpoint_path: Sidecar file for completed batches (None disables
+            checkpointing)
+        batch_size: Number of pages extracted between checkpoint writes
+        progress: Optional callable(pages_done, page_count)
+        backend: Extraction backend name from pdf_backends, or "auto"
+        ocr: OCR pages without a text layer when an OCR engine is installed
+        ocr_workers: Cap on OCR processes (default: one per CPU)
+        failed_pages: Optional list that receives the (1-based) numbers of
+            pages whose OCR failed; their rows are missing from the result
+
+    Returns:
+        List of table rows in page order
+    """
+    ocr = ocr and ocr_available()
+
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+
+        checkpoint = None
+        all_rows, next_page, used_backend = [], 0, None
+        if checkpoint_path:
+            fingerprint = pdf_fingerprint(pdf_path, page_count)
+            all_rows, next_page, valid_size, used_backend = load_checkpoint(
+                checkpoint_path, fingerprint, backend, ocr
+            )
+            if not used_backend:
+                used_backend = resolve_backend(backend, pdf)
+            checkpoint = open(checkpoint_path, "r+b" if valid_size else "wb")
+            # Drop a torn trailing write before appending new batches
+            checkpoint.truncate(valid_size)
+            checkpoint.seek(valid_size)
+            if not valid_size:
+                _append(checkpoint, {
+                    "type": "header", "fingerprint": fingerprint,
+                    "backend": used_backend, "ocr": ocr,
+                })
+        else:
+            used_backend = resolve_backend(backend, pdf)
+        extract_page = make_extractor(used_backend, pdf)
+        ocr_fallback = OcrFallback(pdf_path, ocr_workers) if ocr else None
+
+        try:
+            if progress:
+                progress(next_page, page_count)
+
+            for start in range(next_page, page_count, batch_size):
+                end = min(start + batch_size, page_count)
+                page_rows = {}
+                scanned = []
+                for page in pdf.pages[start:end]:
+                    if ocr_fallback and needs_ocr(page):
+                        scanned.append(page)
+                    else:
+                        page_rows[page.page_number] = extract_page(page)
+                        # Release parsed page objects to keep memory flat on huge files
+                        page.close()
+
+                # Only scanned pages pay for OCR, in parallel across the batch
+                batch_failed = []
+                if scanned:
+                    ocr_rows, ocr_failed = ocr_fallback.extract(scanned)
+                    for index, rows in ocr_rows.items():
+                        page_rows[index + 1] = rows
+                    batch_failed = [index + 1 for index in ocr_failed]
+                    for page in scanned:
+                        page.close()
+                if batch_failed:
+                    if failed_pages is not None:
+                        failed_pages.extend(batch_failed)
+                    # Checkpointing the missing rows would make resumed runs
+                    # skip these pages for good; later batches would sit
+                    # behind the gap, so stop checkpointing altogether
+                    if checkpoint:
+                        checkpoint.close()
+                        checkpoint = None
+
+                batch_rows = []
+                for page_number in sorted(page_rows):
+                    batch_rows.extend(page_rows[page_number])
+
+                if checkpoint:
+                    _append(checkpoint, {
+                        "type": "batch", "start": start, "end": end, "rows": batch_rows,
+                    })
+                all_rows.extend(batch_rows)
+
+                if progress:
+                    progress(end, page_count)
+        finally:
+            if checkpoint:
+                checkpoint.close()
+            if ocr_fallback:
+                ocr_fallback.close()
+
+    return all_rows
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+OCR Fallback for Scanned PDF Pages
+
+Pages without a text layer (scans) yield no tables from pdfplumber. This
+module OCRs only those pages, spread over a process pool, and turns the
+recognized words back into table rows. Results are cached on disk per page
+content hash, so reprocessing the same statement costs no OCR time.
+
+Everything runs offline with a locally installed Tesseract. When the
+engine or its language data is missing, OCR is simply reported as
+unavailable; a page whose OCR fails yields no rows instead of aborting
+the conversion, and is reported back so callers can warn about it.
+
+OCR works when running from source. The packaged app bundles pytesseract
+but not Tesseract itself, which still has to be installed separately.
+
+Dependencies (optional):
+    pip install pytesseract         # plus pypdfium2, installed with pdfplumber
+    Tesseract with the chi_sim language data, e.g.
+        apt install tesseract-ocr tesseract-ocr-chi-sim
+        brew install tesseract tesseract-lang
+
+Environment:
+    WXLS_OCR_CACHE  cache directory (default: ~/.cache/wxls/ocr)
+"""
+
+import hashlib
+import json
+import os
+import statistics
+import sys
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+OCR_LANG = "chi_sim+eng"
+OCR_RESOLUTION = 300
+
+
+def ocr_available(lang=OCR_LANG):
+    """True when pytesseract, the tesseract binary and the language data are installed."""
+    if pytesseract is None:
+        return False
+    try:
+        installed = set(pytesseract.get_languages(config=""))
+    except Exception:
+        return False
+    return set(lang.split("+")) <= installed
+
+
+def needs_ocr(page):
+    """A scanned page has images but no text layer; blank pages are skipped."""
+    return not page.chars and bool(page.images)
+
+
+def cache_dir():
+    return os.environ.get("WXLS_OCR_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "wxls", "ocr"
+    )
+
+
+def page_hash(page, lang=OCR_LANG, resolution=OCR_RESOLUTION):
+    """Hash of a page's drawing instructions and embedded images plus OCR settings."""
+    from pdfminer.pdftypes import resolve1
+
+    digest = hashlib.sha256(f"{lang}|{resolution}|{page.bbox}".encode("utf-8"))
+    for stream in page.page_obj.contents or []:
+        digest.update(resolve1(stream).get_data())
+    for image in page.images:
+        digest.update(image["stream"].get_rawdata() or b"")
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(cache_dir(), key[:2], key + ".json")
+
+
+def load_cached(key):
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def store_cached(key, rows):
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _join(left, right):
+    # Tesseract splits CJK text into single characters; only Latin words get spaces
+    if left and right and left[-1].isascii() and right[0].isascii():
+        return f"{left} {right}"
+    return left + right
+
+
+def rows_from_words(words, gap_factor=1.5, min_support=0.3):
+    """
+    Rebuild table rows from positioned OCR words.
+
+    Words are grouped into lines, lines split into cells at wide gaps, and
+    column starts are taken from cell positions that recur on many lines,
+    so empty cells do not shift later values into the wrong column.
+    """
+    if not words:
+        return []
+
+    height = statistics.median(w["bottom"] - w["top"] for w in words) or 1
+    lines = []
+    for word in sorted(words, key=lambda w: ((w["top"] + w["bottom"]) / 2, w["x0"])):
+        center = (word["top"] + word["bottom"]) / 2
+        if lines and abs(center - lines[-1][0]) <= height / 2:
+            lines[-1][1].append(word)
+        else:
+            lines.append((center, [word]))
+
+    line_cells = []
+    for _, line_words in lines:
+        cells = []
+        for word in sorted(line_words, key=lambda w: w["x0"]):
+            if cells and word["x0"] - cells[-1]["x1"] <= gap_factor * height:
+                cells[-1]["text"] = _join(cells[-1]["text"], word["text"])
+                cells[-1]["x1"] = word["x1"]
+            else:
+                cells.append(dict(word))
+        line_cells.append(cells)
+
+    # Cluster cell starts; keep positions shared by enough lines as columns
+    clusters = []
+    for x0 in sorted(cell["x0"] for cells in line_cells for cell in cells):
+        if clusters and x0 - clusters[-1][-1] <= 2 * height:
+            clusters[-1].append(x0)
+        else:
+            clusters.append([x0])
+    support = max(2, min_support * len(line_cells))
+    columns = [min(c) for c in clusters if len(c) >= support] or [0]
+
+    rows = []
+    for cells in line_cells:
+        row = [""] * len(columns)
+        for cell in cells:
+            col = max(0, bisect_right(columns, cell["x0"] + height) - 1)
+            row[col] = _join(row[col], cell["text"])
+        rows.append(row)
+    return rows
+
+
+def _ocr_page(pdf_path, page_index, lang, resolution):
+    """Render and OCR one page (runs in a worker process)."""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        image = pdf.pages[page_index].to_image(resolution=resolution).original
+
+    data = pytesseract.image_to_data(
+        image, lang=lang, output_type=pytesseract.Output.DICT
+    )
+    words = []
+    for text, conf, left, top, width, height in zip(
+        data["text"], data["conf"], data["left"], data["top"], data["width"], data["height"]
+    ):
+        text = text.strip()
+        if text and float(conf) >= 0:
+            words.append({
+                "text": text, "x0": left, "x1": left + width,
+                "top": top, "bottom": top + height,
+            })
+    return rows_from_words(words)
+
+
+class OcrFallback:
+    """
+    OCR for scanned pages of one PDF, with a process pool and a per-page cache.
+
+    workers caps the OCR processes (default: one per CPU); with 1, pages
+    are OCRed in the calling process without starting a pool.
+    """
+
+    def __init__(self, pdf_path, workers=None, lang=OCR_LANG, resolution=OCR_RESOLUTION):
+        self.pdf_path = pdf_path
+        self.workers = workers or os.cpu_count() or 1
+        self.lang = lang
+        self.resolution = resolution
+        self._pool = None
+
+    def extract(self, pages):
+        """
+        OCR the given pages.
+
+        Args:
+            pages: pdfplumber pages that need OCR (see needs_ocr)
+
+        Returns:
+            (rows, failed): dict mapping page index to its rows, and the
+            sorted indexes of pages whose OCR failed (they map to no rows)
+        """
+        results = {}
+        failed = []
+        pending = {}
+        for page in pages:
+            index = page.page_number - 1
+            key = page_hash(page, self.lang, self.resolution)
+            cached = load_cached(key)
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending[index] = key
+        if not pending:
+            return results, failed
+
+        if self.workers == 1:
+            calls = {
+                index: partial(_ocr_page, self.pdf_path, index, self.lang, self.resolution)
+                for index in pending
+            }
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            calls = {
+                index: self._pool.submit(
+                    _ocr_page, self.pdf_path, index, self.lang, self.resolution
+                ).result
+                for index in pending
+            }
+
+        for index, call in calls.items():
+            try:
+                rows = call()
+            except Exception as e:
+                # Losing one page's rows beats aborting the whole conversion
+                print(f"Warning: OCR failed on page {index + 1} of {self.pdf_path}: {e}",
+                      file=sys.stderr)
+                results[index] = []
+                failed.append(index)
+                continue
+            results[index] = rows
+            store_cached(pending[index], rows)
+
+        return results, sorted(failed)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
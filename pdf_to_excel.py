@@ -8,35 +8,39 @@ Dependencies:
     pip install pdfplumber pandas openpyxl
 
 Usage:
-    python pdf_to_excel.py input.pdf [output.xlsx]
+    python pdf_to_excel.py input.pdf [output.xlsx] [--backend NAME] [--no-ocr]
 
 Examples:
     python pdf_to_excel.py report.pdf
     python pdf_to_excel.py report.pdf output.xlsx
+    python pdf_to_excel.py report.pdf --backend words
+
+Backends (see pdf_backends.py): tables (default), text, words, auto
+
+Scanned pages (no text layer) are OCRed when Tesseract and pytesseract are
+installed locally (see pdf_ocr.py).
 """
 
+import argparse
 import sys
 import os
-import pdfplumber
 from openpyxl import Workbook
 
+from pdf_backends import BACKEND_CHOICES
+from pdf_checkpoint import discard_checkpoint, extract_rows_checkpointed
 
-def extract_tables_from_pdf(pdf_path):
-    """Extract all tables from a PDF file."""
-    all_rows = []
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages, start=1):
-            page_tables = page.extract_tables()
-            for table_idx, table in enumerate(page_tables):
-                if table:
-                    for row in table:
-                        all_rows.append(row)
 
-    return all_rows
+def extract_tables_from_pdf(pdf_path, checkpoint_path=None, backend="tables", ocr=True,
+                            ocr_workers=None, failed_pages=None):
+    """Extract all tables from a PDF file (resumable when checkpoint_path is set)."""
+    return extract_rows_checkpointed(
+        pdf_path, checkpoint_path, backend=backend, ocr=ocr, ocr_workers=ocr_workers,
+        failed_pages=failed_pages,
+    )
 
 
-def convert_pdf_to_excel(pdf_path, excel_path=None, skip_rows=0):
+def convert_pdf_to_excel(pdf_path, excel_path=None, skip_rows=0, checkpoint=True,
+                         backend="tables", ocr=True, ocr_workers=None, failed_pages=None):
     """
     Convert PDF file to Excel spreadsheet.
 
@@ -44,6 +48,18 @@ def convert_pdf_to_excel(pdf_path, excel_path=None, skip_rows=0):
         pdf_path: Path to input PDF file
         excel_path: Path to output Excel file (optional)
         skip_rows: Number of rows to skip from the beginning (default 0)
+        checkpoint: Save extracted rows per page batch to
+            "<excel_path>.checkpoint.jsonl" so an interrupted run resumes
+            from the last completed page (default True)
+        backend: Table extraction backend, one of tables/text/words/auto
+            (default "tables"; "auto" picks the fastest backend matching
+            "tables" on a sample page)
+        ocr: OCR pages without a text layer if a local OCR engine is
+            installed (default True)
+        ocr_workers: Maximum number of OCR processes (default: one per CPU)
+        failed_pages: Optional list that receives the numbers of pages whose
+            OCR failed; their rows are missing and the checkpoint is kept so
+            a rerun retries them
 
     Returns:
         Path to created Excel file
@@ -54,9 +70,16 @@ def convert_pdf_to_excel(pdf_path, excel_path=None, skip_rows=0):
     if excel_path is None:
         excel_path = os.path.splitext(pdf_path)[0] + ".xlsx"
 
-    all_rows = extract_tables_from_pdf(pdf_path)
+    checkpoint_path = excel_path + ".checkpoint.jsonl" if checkpoint else None
+    failed = []
+    all_rows = extract_tables_from_pdf(
+        pdf_path, checkpoint_path, backend, ocr, ocr_workers, failed
+    )
+    if failed_pages is not None:
+        failed_pages.extend(failed)
 
     if not all_rows:
+        discard_checkpoint(checkpoint_path)
         print(f"Warning: No tables found in {pdf_path}")
         return None
 
@@ -72,6 +95,8 @@ def convert_pdf_to_excel(pdf_path, excel_path=None, skip_rows=0):
             ws.cell(row=row_idx, column=col_idx, value=value)
 
     wb.save(excel_path)
+    if not failed:
+        discard_checkpoint(checkpoint_path)
 
     print(f"Converted {pdf_path} -> {excel_path}")
     print(f"Extracted {len(all_rows)} total rows")
@@ -80,18 +105,40 @@ def convert_pdf_to_excel(pdf_path, excel_path=None, skip_rows=0):
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python pdf_to_excel.py <input.pdf> [output.xlsx]")
-        print("\nExample:")
-        print("  python pdf_to_excel.py report.pdf")
-        print("  python pdf_to_excel.py report.pdf output.xlsx")
-        sys.exit(1)
-
-    pdf_path = sys.argv[1]
-    excel_path = sys.argv[2] if len(sys.argv) > 2 else None
+    parser = argparse.ArgumentParser(
+        description="Extract tables from a PDF file into an Excel spreadsheet"
+    )
+    parser.add_argument("pdf_path", help="Input PDF file")
+    parser.add_argument("excel_path", nargs="?", help="Output Excel file")
+    parser.add_argument(
+        "--backend",
+        choices=BACKEND_CHOICES,
+        default="tables",
+        help="Table extraction backend (default: tables)",
+    )
+    parser.add_argument(
+        "--no-ocr",
+        action="store_true",
+        help="Do not OCR scanned pages without a text layer",
+    )
+    parser.add_argument(
+        "--ocr-workers",
+        type=int,
+        help="Maximum number of OCR processes (default: one per CPU)",
+    )
+    args = parser.parse_args()
 
     try:
-        result = convert_pdf_to_excel(pdf_path, excel_path)
+        failed_pages = []
+        result = convert_pdf_to_excel(
+            args.pdf_path, args.excel_path, backend=args.backend, ocr=not args.no_ocr,
+            ocr_workers=args.ocr_workers, failed_pages=failed_pages,
+        )
+        if failed_pages:
+            pages = ", ".join(str(p) for p in failed_pages)
+            print(f"Warning: OCR failed on pages {pages}; their rows are missing. "
+                  "Run again to retry them.")
+            sys.exit(2)
         if result:
             print("Conversion completed successfully!")
         else:
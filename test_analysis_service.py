@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+import unittest
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from urllib.parse import quote
+
+from analysis_service import AnalysisHandler, AnalysisService
+
+STATEMENT = """微信支付账单明细
+微信昵称：[测试]
+起始时间：[2023-01-01 00:00:00] 终止时间：[2023-02-28 23:59:59]
+----------------------微信支付账单明细列表--------------------
+交易时间,交易类型,交易对方,商品,收/支,金额(元),支付方式,当前状态,交易单号,商户单号,备注
+2023-01-05 10:00:00,商户消费,超市,/,支出,¥12.50,零钱,支付成功,1\t,1\t,/
+2023-01-20 09:00:00,转账,张三,/,收入,¥100.00,/,已存入零钱,2\t,/,/
+2023-02-03 12:30:00,商户消费,食堂,/,支出,"¥1,000.00",零钱,支付成功,3\t,3\t,/
+"""
+
+
+class AnalysisServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.service = AnalysisService(workers=1, queue_size=4)
+        AnalysisHandler.service = self.service
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), AnalysisHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.conn = HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=30)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+        work_dir = self.service.work_dir
+        self.service.shutdown()
+        self.assertFalse(os.path.exists(work_dir))
+
+    def request(self, method, path, body=None):
+        self.conn.request(method, path, body)
+        response = self.conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def wait_for(self, status_url, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status, job = self.request("GET", status_url)
+            self.assertEqual(status, 200)
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(0.05)
+        self.fail("job did not finish")
+
+    def test_csv_statement_round_trip(self):
+        status, reply = self.request(
+            "POST", "/jobs?filename=" + quote("微信 账单.csv"), STATEMENT.encode("utf-8")
+        )
+        self.assertEqual(status, 202)
+
+        job = self.wait_for(reply["status_url"])
+        self.assertEqual(job["status"], "done", job.get("error"))
+        self.assertEqual(job["filename"], "微信 账单.csv")
+        self.assertEqual(job["monthly_stats"], [
+            {"月份": "2023-01", "收入": 100.0, "支出": 12.5, "净收入": 87.5},
+            {"月份": "2023-02", "收入": 0.0, "支出": 1000.0, "净收入": -1000.0},
+        ])
+        # The upload is removed once the job finishes
+        self.assertEqual(os.listdir(self.service.work_dir), [])
+
+        status, metrics = self.request("GET", "/metrics")
+        self.assertEqual(metrics["jobs"]["done"], 1)
+
+    def test_unsupported_and_unknown(self):
+        status, reply = self.request("POST", "/jobs?filename=bill.txt", b"data")
+        self.assertEqual(status, 400)
+        status, reply = self.request("GET", "/jobs/missing")
+        self.assertEqual(status, 404)
+
+    def test_invalid_statement_fails_job(self):
+        status, reply = self.request("POST", "/jobs?filename=bad.csv", b"a,b,c\n1,2,3\n")
+        self.assertEqual(status, 202)
+        job = self.wait_for(reply["status_url"])
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("ValueError", job["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode
+
+from form_replay import MockFormHandler, ReplaySession, make_template, render_body
+from job_journal import UncertainOutcome, run_batch
+
+RECORD = {"id": "1", "zf_name": "111", "sjjyxx_daaress": "111111", "uname": "张 三"}
+OTHER = {"id": "2", "zf_name": "222", "sjjyxx_daaress": "北京市 1号", "uname": "李四"}
+
+
+def captured(body, content_type):
+    return {
+        "method": "POST",
+        "url": "https://example.invalid/api/submit",
+        "headers": {"Content-Type": content_type, "Content-Length": "99", "X-Token": "t"},
+        "body": body,
+    }
+
+
+class TemplateTest(unittest.TestCase):
+    def setUp(self):
+        self.today = datetime.date.today().isoformat()
+
+    def payload(self, record):
+        return {"name": record["zf_name"], "address": record["sjjyxx_daaress"],
+                "person": record["uname"], "date": self.today}
+
+    def test_json_round_trip(self):
+        body = json.dumps(self.payload(RECORD), ensure_ascii=False)
+        template = make_template(captured(body, "application/json"), RECORD, expect="ok")
+        self.assertEqual(set(template["fields"].values()), {"json"})
+        self.assertIn("{{today}}", template["body"])
+        self.assertNotIn("111", template["body"])
+        self.assertEqual(template["expect"], "ok")
+        self.assertEqual(template["headers"], {"Content-Type": "application/json", "X-Token": "t"})
+        self.assertEqual(json.loads(render_body(template, OTHER)), self.payload(OTHER))
+
+    def test_json_ascii_escapes(self):
+        body = json.dumps(self.payload(RECORD))
+        template = make_template(captured(body, "application/json;charset=UTF-8"), RECORD)
+        self.assertEqual(template["fields"]["uname"], "json-ascii")
+        self.assertEqual(render_body(template, OTHER), json.dumps(self.payload(OTHER)))
+
+    def test_form_encoding(self):
+        body = urlencode(self.payload(RECORD))
+        template = make_template(
+            captured(body, "application/x-www-form-urlencoded"), RECORD
+        )
+        self.assertEqual(set(template["fields"].values()), {"form"})
+        parsed = {k: v[0] for k, v in parse_qs(render_body(template, OTHER)).items()}
+        self.assertEqual(parsed, self.payload(OTHER))
+
+    def test_raw_encoding(self):
+        body = f"name={RECORD['zf_name']};address={RECORD['sjjyxx_daaress']}"
+        template = make_template(captured(body, "text/plain"), RECORD)
+        self.assertEqual(template["body"], "name={{zf_name}};address={{sjjyxx_daaress}}")
+        self.assertEqual(render_body(template, OTHER), "name=222;address=北京市 1号")
+
+    def test_longest_value_replaced_first(self):
+        # "111" is a substring of "111111"; replacing it first would corrupt the address
+        body = "a=111111&b=111"
+        template = make_template(captured(body, "text/plain"), RECORD)
+        self.assertEqual(template["body"], "a={{sjjyxx_daaress}}&b={{zf_name}}")
+
+    def test_missing_value_warns(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            template = make_template(captured("name=111", "text/plain"), RECORD)
+        self.assertNotIn("uname", template["fields"])
+        self.assertIn("'uname' not found", output.getvalue())
+
+
+class RecordingHandler(MockFormHandler):
+    """Mock backend that keeps the bodies it received."""
+
+    bodies = []
+    payload = {"code": 200, "msg": "success"}
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        type(self).bodies.append(self.rfile.read(length).decode("utf-8"))
+        self.answer()
+
+    def answer(self):
+        data = json.dumps(self.payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class DroppingHandler(RecordingHandler):
+    """Reads the submission, then closes the socket without answering."""
+
+    bodies = []
+
+    def answer(self):
+        self.close_connection = True
+
+
+class ErrorBodyHandler(RecordingHandler):
+    """Answers 200 with an application-level error."""
+
+    bodies = []
+    payload = {"code": 500, "msg": "验证码错误"}
+
+
+class IdleCloseHandler(RecordingHandler):
+    """Answers, then closes the keep-alive connection without saying so."""
+
+    bodies = []
+
+    def answer(self):
+        super().answer()
+        self.close_connection = True
+
+
+class ReplayRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.tmp.name, "records.journal.jsonl")
+        body = json.dumps({"name": RECORD["zf_name"], "address": RECORD["sjjyxx_daaress"]})
+        self.template = make_template(captured(body, "application/json"), RECORD)
+        self.records = [
+            {"id": str(i), "zf_name": f"name-{i}", "sjjyxx_daaress": f"addr {i}", "uname": ""}
+            for i in range(10)
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def serve(self, handler):
+        handler.bodies.clear()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_address[1]}/submit"
+
+    def statuses(self):
+        with open(self.journal, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        return {e["key"]: e["status"] for e in entries if e["type"] == "record"}
+
+    def test_round_trip_against_mock(self):
+        url = self.serve(RecordingHandler)
+        session = ReplaySession(self.template, url=url, expect="success")
+        summary = run_batch(self.records, session.submit, self.journal, workers=3, backoff=0)
+        self.assertEqual(summary["succeeded"], 10)
+        received = sorted(json.loads(b)["name"] for b in RecordingHandler.bodies)
+        self.assertEqual(received, sorted(r["zf_name"] for r in self.records))
+
+        # A rerun sends nothing
+        summary = run_batch(self.records, session.submit, self.journal, backoff=0)
+        self.assertEqual(summary["skipped"], 10)
+        self.assertEqual(len(RecordingHandler.bodies), 10)
+
+    def test_connection_dropped_after_send_is_not_resent(self):
+        url = self.serve(DroppingHandler)
+        session = ReplaySession(self.template, url=url, expect="success", timeout=5)
+        summary = run_batch(self.records[:1], session.submit, self.journal,
+                            retries=2, backoff=0)
+        self.assertEqual(len(DroppingHandler.bodies), 1)
+        self.assertEqual(summary["unknown"], 1)
+        self.assertEqual(self.statuses(), {"0": "unknown"})
+
+        summary = run_batch(self.records[:1], session.submit, self.journal, backoff=0)
+        self.assertEqual(len(DroppingHandler.bodies), 1)
+        self.assertEqual(summary["in_doubt_keys"], ["0"])
+
+    def test_error_body_with_2xx(self):
+        url = self.serve(ErrorBodyHandler)
+        # With a success marker the rejection is a plain failure
+        session = ReplaySession(self.template, url=url, expect="success")
+        summary = run_batch(self.records[:1], session.submit, self.journal,
+                            retries=1, backoff=0)
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(self.statuses(), {"0": "failed"})
+
+        # Without one the 2xx cannot be confirmed, so it is never marked ok
+        session = ReplaySession(self.template, url=url)
+        with self.assertRaises(UncertainOutcome):
+            session.submit(self.records[1])
+
+    def test_connection_closed_while_idle_is_reopened(self):
+        url = self.serve(IdleCloseHandler)
+        session = ReplaySession(self.template, url=url, expect="success")
+        session.submit(self.records[0])
+        time.sleep(0.1)
+        session.submit(self.records[1])
+        self.assertEqual(len(IdleCloseHandler.bodies), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+import unittest
+
+from job_journal import JobJournal, UncertainOutcome, record_key, run_batch
+
+
+def read_journal(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class Submitter:
+    """Records submissions; fails records listed in fail (key -> failures left)."""
+
+    def __init__(self, fail=None, uncertain=()):
+        self.fail = dict(fail or {})
+        self.uncertain = set(uncertain)
+        self.submitted = []
+
+    def __call__(self, record):
+        self.submitted.append(record["id"])
+        if record["id"] in self.uncertain:
+            raise UncertainOutcome("no confirmation")
+        if self.fail.get(record["id"], 0) > 0:
+            self.fail[record["id"]] -= 1
+            raise RuntimeError("boom")
+
+
+class RunBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.tmp.name, "records.journal.jsonl")
+        self.records = [{"id": str(i), "name": f"n{i}"} for i in range(5)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_key_uses_id_or_content(self):
+        self.assertEqual(record_key({"id": "7", "a": "1"}), "7")
+        self.assertEqual(record_key({"a": "1", "b": "2"}), record_key({"b": "2", "a": "1"}))
+        self.assertNotEqual(record_key({"a": "1"}), record_key({"a": "2"}))
+
+    def test_retries_until_success(self):
+        submit = Submitter(fail={"1": 2})
+        summary = run_batch(self.records, submit, self.journal, retries=2, backoff=0)
+        self.assertEqual(summary["succeeded"], 5)
+        self.assertEqual(summary["failed"], 0)
+        self.assertEqual(summary["attempts"], 7)
+        self.assertEqual(submit.submitted.count("1"), 3)
+
+    def test_rerun_skips_done_and_retries_failed(self):
+        first = Submitter(fail={"2": 10})
+        summary = run_batch(self.records, first, self.journal, retries=1, backoff=0)
+        self.assertEqual((summary["succeeded"], summary["failed"]), (4, 1))
+
+        second = Submitter()
+        summary = run_batch(self.records, second, self.journal, retries=1, backoff=0)
+        self.assertEqual(second.submitted, ["2"])
+        self.assertEqual((summary["skipped"], summary["succeeded"]), (4, 1))
+
+    def test_attempt_written_before_submit(self):
+        def submit(record):
+            entries = read_journal(self.journal)
+            self.assertEqual(entries[-1]["type"], "attempt")
+            self.assertEqual(entries[-1]["key"], record["id"])
+
+        run_batch(self.records[:2], submit, self.journal, backoff=0)
+
+    def test_crash_mid_submit_is_flagged_not_resubmitted(self):
+        with JobJournal(self.journal) as journal:
+            journal.append({"type": "record", "key": "0", "status": "ok"})
+            journal.append({"type": "attempt", "key": "1", "attempt": 1})
+
+        submit = Submitter()
+        summary = run_batch(self.records, submit, self.journal, backoff=0)
+        self.assertNotIn("1", submit.submitted)
+        self.assertEqual(summary["in_doubt_keys"], ["1"])
+        self.assertEqual(summary["succeeded"], 3)
+
+        summary = run_batch(
+            self.records, submit, self.journal, backoff=0, resubmit_in_doubt=True
+        )
+        self.assertEqual(submit.submitted.count("1"), 1)
+        self.assertEqual(summary["succeeded"], 1)
+
+    def test_uncertain_outcome_is_not_retried(self):
+        submit = Submitter(uncertain={"3"})
+        summary = run_batch(self.records, submit, self.journal, retries=3, backoff=0)
+        self.assertEqual(submit.submitted.count("3"), 1)
+        self.assertEqual(summary["unknown"], 1)
+
+        again = Submitter()
+        summary = run_batch(self.records, again, self.journal, backoff=0)
+        self.assertEqual(again.submitted, [])
+        self.assertEqual(summary["in_doubt_keys"], ["3"])
+
+    def test_truncated_last_line_is_ignored(self):
+        run_batch(self.records[:2], Submitter(), self.journal, backoff=0)
+        with open(self.journal, "a", encoding="utf-8") as f:
+            f.write('{"type": "record", "key": "2", "sta')
+
+        submit = Submitter()
+        summary = run_batch(self.records, submit, self.journal, backoff=0)
+        self.assertEqual(submit.submitted, ["2", "3", "4"])
+        self.assertEqual(summary["skipped"], 2)
+
+    def test_concurrent_workers(self):
+        submit = Submitter(fail={"4": 1})
+        summary = run_batch(self.records, submit, self.journal, backoff=0, workers=3)
+        self.assertEqual(summary["succeeded"], 5)
+        statuses = {
+            e["key"]: e["status"] for e in read_journal(self.journal) if e["type"] == "record"
+        }
+        self.assertEqual(statuses, {r["id"]: "ok" for r in self.records})
+
+    def test_workers_bound_in_flight_records(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def submit(record):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        records = [{"id": str(i)} for i in range(30)]
+        run_batch(records, submit, self.journal, workers=4)
+        self.assertLessEqual(running[1], 4)
+
+    @unittest.skipUnless(hasattr(signal, "setitimer"), "needs SIGALRM")
+    def test_interrupt_journals_everything_submitted(self):
+        submitted = []
+
+        def submit(record):
+            submitted.append(record["id"])
+            time.sleep(0.2)
+
+        def interrupt(signum, frame):
+            raise KeyboardInterrupt
+
+        previous = signal.signal(signal.SIGALRM, interrupt)
+        signal.setitimer(signal.ITIMER_REAL, 0.5)
+        records = [{"id": str(i)} for i in range(40)]
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                run_batch(records, submit, self.journal, workers=4)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+        self.assertLess(len(submitted), 40)
+        outcomes = {
+            e["key"] for e in read_journal(self.journal) if e["type"] == "record"
+        }
+        self.assertEqual(outcomes, set(submitted))
+
+
+if __name__ == "__main__":
+    unittest.main()
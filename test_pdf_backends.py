@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+import pdfplumber
+
+from pdf_backends import make_extractor
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle
+except ImportError:
+    SimpleDocTemplate = None
+
+
+def make_pdf(path, layouts, rows=4):
+    """One ruled table per page; layouts lists the column count of each page."""
+    story = []
+    for page, columns in enumerate(layouts):
+        data = [[f"H{col}" for col in range(columns)]]
+        data += [[f"{page}.{row}.{col}" for col in range(columns)] for row in range(rows)]
+        table = Table(data)
+        table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.black)]))
+        story += [table, PageBreak()]
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+
+
+@unittest.skipIf(SimpleDocTemplate is None, "reportlab is needed to build a sample PDF")
+class WordsBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pdf = os.path.join(self.tmp.name, "mixed.pdf")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_reference_when_layout_changes(self):
+        make_pdf(self.pdf, [6, 6, 3, 6])
+        with pdfplumber.open(self.pdf) as pdf:
+            tables = make_extractor("tables", pdf)
+            words = make_extractor("words", pdf)
+            for page in pdf.pages:
+                self.assertEqual(words(page), tables(page), f"page {page.page_number}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pdf_checkpoint
+from pdf_checkpoint import extract_rows_checkpointed, load_checkpoint
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle
+except ImportError:
+    SimpleDocTemplate = None
+
+
+FINGERPRINT = {"size": 100, "sha1": "abc", "pages": 4}
+
+
+def write_lines(path, entries, tail=b""):
+    with open(path, "wb") as f:
+        for entry in entries:
+            f.write(json.dumps(entry).encode("utf-8") + b"\n")
+        f.write(tail)
+
+
+def make_pdf(path, pages=6, rows=5):
+    story = []
+    for page in range(pages):
+        data = [["No", "Amount"]] + [[f"{page}-{row}", f"{row}.00"] for row in range(rows)]
+        table = Table(data)
+        table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.black)]))
+        story += [table, PageBreak()]
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class LoadCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out.xlsx.checkpoint.jsonl")
+        self.header = {"type": "header", "fingerprint": FINGERPRINT,
+                       "backend": "tables", "ocr": False}
+        self.batches = [
+            {"type": "batch", "start": 0, "end": 2, "rows": [["a"], ["b"]]},
+            {"type": "batch", "start": 2, "end": 3, "rows": [["c"]]},
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_missing_file(self):
+        self.assertEqual(load_checkpoint(self.path, FINGERPRINT), ([], 0, 0, None))
+
+    def test_torn_last_write_is_excluded(self):
+        write_lines(self.path, [self.header] + self.batches, b'{"type": "batch", "sta')
+        rows, next_page, valid_size, backend = load_checkpoint(self.path, FINGERPRINT)
+        self.assertEqual(rows, [["a"], ["b"], ["c"]])
+        self.assertEqual(next_page, 3)
+        self.assertEqual(backend, "tables")
+        self.assertEqual(valid_size, os.path.getsize(self.path) - len(b'{"type": "batch", "sta'))
+
+    def test_out_of_order_batch_stops_resume(self):
+        gap = {"type": "batch", "start": 3, "end": 4, "rows": [["d"]]}
+        write_lines(self.path, [self.header, self.batches[0], gap])
+        rows, next_page, _, _ = load_checkpoint(self.path, FINGERPRINT)
+        self.assertEqual((rows, next_page), ([["a"], ["b"]], 2))
+
+    def test_mismatched_checkpoint_is_ignored(self):
+        write_lines(self.path, [self.header] + self.batches)
+        other = dict(FINGERPRINT, sha1="def")
+        self.assertEqual(load_checkpoint(self.path, other), ([], 0, 0, None))
+        self.assertEqual(load_checkpoint(self.path, FINGERPRINT, backend="words"),
+                         ([], 0, 0, None))
+        self.assertEqual(load_checkpoint(self.path, FINGERPRINT, ocr=True),
+                         ([], 0, 0, None))
+
+
+@unittest.skipIf(SimpleDocTemplate is None, "reportlab is needed to build a sample PDF")
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pdf = os.path.join(self.tmp.name, "statement.pdf")
+        self.checkpoint = self.pdf + ".checkpoint.jsonl"
+        make_pdf(self.pdf)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def extract(self, progress=None):
+        return extract_rows_checkpointed(
+            self.pdf, self.checkpoint, batch_size=2, progress=progress,
+            backend="tables", ocr=False,
+        )
+
+    def test_resume_after_crash_with_torn_write(self):
+        expected = extract_rows_checkpointed(self.pdf, backend="tables", ocr=False)
+        self.assertEqual(len(expected), 6 * 6)
+
+        def crash(done, total):
+            if done >= 4:
+                raise Interrupted
+
+        with self.assertRaises(Interrupted):
+            self.extract(crash)
+        with open(self.checkpoint, "ab") as f:
+            f.write(b'{"type": "batch", "start": 4, "end"')
+
+        pages_seen = []
+        rows = self.extract(lambda done, total: pages_seen.append(done))
+        self.assertEqual(rows, expected)
+        # Resumed after the two completed batches, not from the start
+        self.assertEqual(pages_seen, [4, 6])
+
+        with open(self.checkpoint, "rb") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual([e.get("end") for e in entries[1:]], [2, 4, 6])
+
+    def test_failed_ocr_page_is_reported_and_not_checkpointed(self):
+        class FailingOcr:
+            """Page 3 counts as scanned and its OCR fails."""
+
+            def __init__(self, pdf_path, workers=None):
+                pass
+
+            def extract(self, pages):
+                return {page.page_number - 1: [] for page in pages}, [2]
+
+            def close(self):
+                pass
+
+        failed_pages = []
+        with mock.patch.object(pdf_checkpoint, "ocr_available", lambda: True), \
+                mock.patch.object(pdf_checkpoint, "OcrFallback", FailingOcr), \
+                mock.patch.object(pdf_checkpoint, "needs_ocr",
+                                  lambda page: page.page_number == 3):
+            rows = extract_rows_checkpointed(
+                self.pdf, self.checkpoint, batch_size=2, backend="tables",
+                failed_pages=failed_pages,
+            )
+        self.assertEqual(failed_pages, [3])
+        self.assertEqual(len(rows), 5 * 6)
+
+        # Only the batch before the failure is kept, so a rerun retries page 3
+        with open(self.checkpoint, "rb") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual([e.get("end") for e in entries[1:]], [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pdf_ocr
+from pdf_ocr import OcrFallback, needs_ocr, rows_from_words
+
+
+def word(text, x0, top, width=40, height=10):
+    return {"text": text, "x0": x0, "x1": x0 + width, "top": top, "bottom": top + height}
+
+
+class RowsFromWordsTest(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(rows_from_words([]), [])
+
+    def test_lines_and_columns(self):
+        words = [
+            word("时间", 10, 10), word("金额", 200, 11), word("对方", 400, 10),
+            word("2023-01-01", 10, 40, 80), word("12.00", 200, 41), word("超市", 400, 39),
+            word("2023-01-02", 10, 70, 80), word("8.50", 200, 70), word("食堂", 400, 70),
+        ]
+        self.assertEqual(rows_from_words(words), [
+            ["时间", "金额", "对方"],
+            ["2023-01-01", "12.00", "超市"],
+            ["2023-01-02", "8.50", "食堂"],
+        ])
+
+    def test_empty_cell_keeps_later_values_in_place(self):
+        words = [
+            word("a", 10, 10), word("b", 200, 10), word("c", 400, 10),
+            word("d", 10, 40), word("f", 400, 40),
+            word("g", 10, 70), word("h", 200, 70), word("i", 400, 70),
+        ]
+        self.assertEqual(rows_from_words(words)[1], ["d", "", "f"])
+
+    def test_close_words_join_into_one_cell(self):
+        # Tesseract splits CJK text into characters; Latin words keep their spaces
+        words = [
+            word("支", 10, 10, 10), word("出", 22, 10, 10), word("Pay", 200, 10, 20),
+            word("Later", 225, 10, 30),
+            word("收", 10, 40, 10), word("入", 22, 40, 10), word("Cash", 200, 40, 25),
+        ]
+        self.assertEqual(rows_from_words(words), [["支出", "Pay Later"], ["收入", "Cash"]])
+
+
+class NeedsOcrTest(unittest.TestCase):
+    def test_only_image_pages_without_text(self):
+        self.assertTrue(needs_ocr(SimpleNamespace(chars=[], images=[{}])))
+        self.assertFalse(needs_ocr(SimpleNamespace(chars=[], images=[])))
+        self.assertFalse(needs_ocr(SimpleNamespace(chars=[{}], images=[{}])))
+
+
+class OcrFallbackTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"WXLS_OCR_CACHE": self.tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.pages = [SimpleNamespace(page_number=n) for n in (2, 5)]
+
+    def extract(self, ocr_page):
+        with mock.patch.object(pdf_ocr, "page_hash", lambda page, *args: f"p{page.page_number}"), \
+                mock.patch.object(pdf_ocr, "_ocr_page", ocr_page):
+            fallback = OcrFallback("statement.pdf", workers=1)
+            try:
+                return fallback.extract(self.pages)
+            finally:
+                fallback.close()
+
+    def test_failed_page_yields_no_rows(self):
+        def ocr_page(pdf_path, index, lang, resolution):
+            if index == 4:
+                raise RuntimeError("Failed loading language 'chi_sim'")
+            return [[f"row {index}"]]
+
+        with mock.patch("sys.stderr"):
+            self.assertEqual(self.extract(ocr_page), ({1: [["row 1"]], 4: []}, [4]))
+        # Only the successful page is cached, the failed one is retried next time
+        self.assertEqual(pdf_ocr.load_cached("p2"), [["row 1"]])
+        self.assertIsNone(pdf_ocr.load_cached("p5"))
+
+    def test_cached_pages_are_not_ocred_again(self):
+        self.extract(lambda pdf_path, index, lang, resolution: [[str(index)]])
+
+        def fail(*args):
+            raise AssertionError("OCR should come from the cache")
+
+        self.assertEqual(self.extract(fail), ({1: [["1"]], 4: [["4"]]}, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
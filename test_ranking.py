@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from wechat_transactions import RankingAccumulator
+
+
+def transactions(rows):
+    """rows: (counterparty, type, direction, amount) tuples."""
+    return pd.DataFrame(rows, columns=["交易对方", "交易类型", "收/支/其他", "金额(元)"])
+
+
+ROWS = [
+    ("房东", "转账", "支出", 3000.0),
+    ("超市", "商户消费", "支出", 45.5),
+    ("超市", "商户消费", "支出", 12.25),
+    ("食堂", "商户消费", "支出", 15.0),
+    ("食堂", "商户消费", "支出", 16.0),
+    ("食堂", "商户消费", "支出", 14.5),
+    ("公司", "转账", "收入", 8000.0),
+    ("超市", "商户消费", "支出", 30.0),
+    ("长名称\n商户", "商户消费", "支出", 99.0),
+]
+
+
+class RankingAccumulatorTest(unittest.TestCase):
+    def ranking(self, *chunks, direction="支出"):
+        ranking = RankingAccumulator(direction)
+        for chunk in chunks:
+            ranking.add(chunk)
+        return ranking
+
+    def test_by_amount_and_by_count(self):
+        ranking = self.ranking(transactions(ROWS))
+        by_amount = ranking.top("交易对方")
+        self.assertEqual(list(by_amount["交易对方"]), ["房东", "长名称商户", "超市", "食堂"])
+        self.assertEqual(list(by_amount["金额"]), [3000.0, 99.0, 87.75, 45.5])
+        self.assertEqual(list(by_amount["笔数"]), [1, 1, 3, 3])
+
+        by_count = ranking.top("交易类型", by="笔数")
+        self.assertEqual(by_count.values.tolist(), [["商户消费", 232.25, 7], ["转账", 3000.0, 1]])
+        self.assertEqual(list(ranking.top("交易对方", n=2)["交易对方"]), ["房东", "长名称商户"])
+
+    def test_income_ranking(self):
+        ranking = self.ranking(transactions(ROWS), direction="收入")
+        self.assertEqual(ranking.top("交易对方").values.tolist(), [["公司", 8000.0, 1]])
+
+    def test_placeholders_are_dropped(self):
+        rows = ROWS + [
+            ("/", "/", "支出", 5000.0), ("", "商户消费", "支出", 4000.0),
+            (None, "商户消费", "支出", 6000.0), (np.nan, None, "支出", 7000.0),
+        ]
+        ranking = self.ranking(transactions(rows))
+        parties = set(ranking.top("交易对方")["交易对方"])
+        self.assertEqual(parties, {"房东", "长名称商户", "超市", "食堂"})
+        types = ranking.top("交易类型").values.tolist()
+        # Rows without a counterparty still count towards their transaction type
+        self.assertEqual(types, [["商户消费", 10232.25, 9], ["转账", 3000.0, 1]])
+
+    def test_chunks_and_merge_match_single_pass(self):
+        df = transactions(ROWS + [("/", "/", "支出", 1.0)])
+        expected = self.ranking(df)
+
+        chunked = self.ranking(*(df.iloc[i:i + 2] for i in range(0, len(df), 2)))
+        left, right = self.ranking(df.iloc[:4]), self.ranking(df.iloc[4:])
+        merged = left.merge(right)
+
+        for ranking in (chunked, merged):
+            self.assertEqual(ranking.totals, expected.totals)
+            for dimension in RankingAccumulator.DIMENSIONS:
+                for by in ("金额", "笔数"):
+                    pd.testing.assert_frame_equal(
+                        ranking.top(dimension, by=by), expected.top(dimension, by=by)
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from wechat_transactions import RecurringPaymentDetector
+
+
+def transactions(rows):
+    """rows: (counterparty, time, amount) tuples, all expenses."""
+    df = pd.DataFrame(rows, columns=["交易对方", "交易时间", "金额(元)"])
+    df["交易时间"] = pd.to_datetime(df["交易时间"])
+    df["收/支/其他"] = "支出"
+    return df
+
+
+def series(name, start, count, amount, **step):
+    first = pd.Timestamp(start)
+    return [(name, first + pd.DateOffset(**{k: v * i for k, v in step.items()}), amount)
+            for i in range(count)]
+
+
+class RecurringPaymentDetectorTest(unittest.TestCase):
+    def detect(self, *chunks, **options):
+        detector = RecurringPaymentDetector(**options)
+        for chunk in chunks:
+            detector.add(chunk)
+        return detector.detect()
+
+    def test_empty(self):
+        result = RecurringPaymentDetector().detect()
+        self.assertTrue(result.empty)
+        self.assertEqual(list(result.columns), RecurringPaymentDetector.COLUMNS)
+
+    def test_detects_periods(self):
+        rows = (
+            series("房东", "2023-01-05", 12, 3000.0, months=1)
+            + series("咖啡订阅", "2023-01-02", 20, 15.0, weeks=1)
+            + series("视频会员", "2021-03-01", 3, 198.0, years=1)
+        )
+        result = self.detect(transactions(rows)).set_index("交易对方")
+        self.assertEqual(result.loc["房东", "周期"], "每月")
+        self.assertEqual(result.loc["房东", "次数"], 12)
+        self.assertEqual(result.loc["咖啡订阅", "周期"], "每周")
+        self.assertEqual(result.loc["视频会员", "周期"], "每年")
+        self.assertEqual(result.loc["咖啡订阅", "下次预计"], pd.Timestamp("2023-05-22"))
+        # Sorted by average amount, highest first
+        self.assertEqual(list(result.index), ["房东", "视频会员", "咖啡订阅"])
+
+    def test_amount_jitter_stays_one_series(self):
+        rows = series("云盘", "2023-01-10", 12, 25.0, months=1)
+        jitter = np.random.default_rng(0).uniform(-1, 1, len(rows))
+        rows = [(name, when, amount + delta) for (name, when, amount), delta in zip(rows, jitter)]
+        result = self.detect(transactions(rows))
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result.loc[0, "次数"], 12)
+
+    def test_different_amounts_are_separate_series(self):
+        rows = (
+            series("电信", "2023-01-01", 6, 50.0, months=1)
+            + series("电信", "2023-01-15", 6, 200.0, months=1)
+        )
+        result = self.detect(transactions(rows))
+        self.assertEqual(sorted(result["平均金额"]), [50.0, 200.0])
+
+    def test_irregular_payments_are_ignored(self):
+        times = ["2023-01-01", "2023-01-04", "2023-02-20", "2023-03-01", "2023-06-11"]
+        rows = [("便利店", t, 20.0) for t in times]
+        self.assertTrue(self.detect(transactions(rows)).empty)
+
+    def test_income_is_ignored(self):
+        df = transactions(series("公司", "2023-01-10", 6, 8000.0, months=1))
+        df["收/支/其他"] = "收入"
+        self.assertTrue(self.detect(df).empty)
+
+    def test_missing_counterparty(self):
+        rows = series("房东", "2023-01-05", 6, 3000.0, months=1)
+        rows += [(None, "2023-02-01", 10.0), (np.nan, "2023-03-01", 10.0),
+                 ("", "2023-04-01", 10.0), ("/", "2023-05-01", 10.0)]
+        result = self.detect(transactions(rows))
+        self.assertEqual(list(result["交易对方"]), ["房东"])
+
+        only_missing = transactions([(None, "2023-01-01", 5.0), (np.nan, "2023-02-01", 5.0)])
+        self.assertTrue(self.detect(only_missing).empty)
+
+    def test_chunks_and_merge_match_single_pass(self):
+        rows = (
+            series("房东", "2023-01-05", 12, 3000.0, months=1)
+            + series("健身房", "2023-01-03", 10, 99.0, months=1)
+        )
+        df = transactions(rows).sample(frac=1, random_state=1)
+        expected = self.detect(df)
+
+        chunked = self.detect(df.iloc[:7], df.iloc[7:])
+        pd.testing.assert_frame_equal(chunked, expected)
+
+        left, right = RecurringPaymentDetector(), RecurringPaymentDetector()
+        left.add(df.iloc[:10])
+        right.add(df.iloc[10:])
+        pd.testing.assert_frame_equal(left.merge(right).detect(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+
+import pandas as pd
+
+from wechat_transactions import TransactionRollup
+
+
+def transactions(rows):
+    """rows: (time, direction, amount) tuples."""
+    df = pd.DataFrame(rows, columns=["交易时间", "收/支/其他", "金额(元)"])
+    df["交易时间"] = pd.to_datetime(df["交易时间"])
+    return df
+
+
+# Spans the 2020/2021 ISO year boundary: 2020 has 53 ISO weeks, and
+# 2021-01-01..03 still belong to 2020-W53
+ROWS = [
+    ("2020-12-27 09:00", "支出", 10.0),   # Sunday, 2020-W52
+    ("2020-12-28 09:00", "支出", 20.0),   # Monday, 2020-W53
+    ("2020-12-31 23:59", "收入", 500.0),
+    ("2021-01-01 00:01", "支出", 30.0),
+    ("2021-01-01 12:00", "支出", 5.0),
+    ("2021-01-03 18:00", "收入", 100.0),
+    ("2021-01-04 08:00", "支出", 40.0),   # Monday, 2021-W01
+    ("2021-04-01 10:00", "支出", 7.0),
+]
+
+
+class TransactionRollupTest(unittest.TestCase):
+    def setUp(self):
+        self.rollup = TransactionRollup.from_transactions(transactions(ROWS))
+
+    def view(self, granularity):
+        return [tuple(row) for row in self.rollup.view(granularity).values.tolist()]
+
+    def test_day_view(self):
+        self.assertEqual(self.view("日"), [
+            ("2020-12-27", 0.0, 10.0, -10.0),
+            ("2020-12-28", 0.0, 20.0, -20.0),
+            ("2020-12-31", 500.0, 0.0, 500.0),
+            ("2021-01-01", 0.0, 35.0, -35.0),
+            ("2021-01-03", 100.0, 0.0, 100.0),
+            ("2021-01-04", 0.0, 40.0, -40.0),
+            ("2021-04-01", 0.0, 7.0, -7.0),
+        ])
+        self.assertEqual(list(self.rollup.view("日").columns), ["日期", "收入", "支出", "净收入"])
+
+    def test_week_view_across_iso_year_boundary(self):
+        self.assertEqual(self.view("周"), [
+            ("2020-W52", 0.0, 10.0, -10.0),
+            ("2020-W53", 600.0, 55.0, 545.0),
+            ("2021-W01", 0.0, 40.0, -40.0),
+            ("2021-W13", 0.0, 7.0, -7.0),
+        ])
+
+    def test_month_quarter_year_views(self):
+        self.assertEqual(self.view("月"), [
+            ("2020-12", 500.0, 30.0, 470.0),
+            ("2021-01", 100.0, 75.0, 25.0),
+            ("2021-04", 0.0, 7.0, -7.0),
+        ])
+        self.assertEqual(self.view("季度"), [
+            ("2020Q4", 500.0, 30.0, 470.0),
+            ("2021Q1", 100.0, 75.0, 25.0),
+            ("2021Q2", 0.0, 7.0, -7.0),
+        ])
+        self.assertEqual(self.view("年"), [
+            ("2020", 500.0, 30.0, 470.0),
+            ("2021", 100.0, 82.0, 18.0),
+        ])
+
+    def test_range_total(self):
+        def total(start, end):
+            result = self.rollup.range_total(start, end)
+            return result["收入"], result["支出"], result["净收入"]
+
+        # Inclusive on both ends, whatever the time of day
+        self.assertEqual(total("2020-12-31", "2021-01-01"), (500.0, 35.0, 465.0))
+        self.assertEqual(total("2020-12-31 23:00", "2021-01-01 00:00"), (500.0, 35.0, 465.0))
+        # Start and end on days without transactions
+        self.assertEqual(total("2020-12-29", "2021-01-02"), (500.0, 35.0, 465.0))
+        self.assertEqual(total("2021-01-05", "2021-03-31"), (0.0, 0.0, 0.0))
+        # Ranges covering or outside the data
+        self.assertEqual(total("2000-01-01", "2030-01-01"), (600.0, 112.0, 488.0))
+        self.assertEqual(total("2019-01-01", "2020-12-27"), (0.0, 10.0, -10.0))
+        self.assertEqual(total("2019-01-01", "2019-12-31"), (0.0, 0.0, 0.0))
+        self.assertEqual(total("2022-01-01", "2022-12-31"), (0.0, 0.0, 0.0))
+        # An inverted range is empty
+        self.assertEqual(total("2021-01-04", "2020-12-27"), (0.0, 0.0, 0.0))
+
+    def test_merge_sums_overlapping_days(self):
+        other = TransactionRollup.from_transactions(transactions([
+            ("2021-01-01 20:00", "支出", 65.0),
+            ("2021-01-01 21:00", "收入", 1.0),
+            ("2021-02-01 10:00", "收入", 9.0),
+        ]))
+        merged = TransactionRollup.merge([self.rollup, other])
+        daily = merged.daily
+        self.assertEqual(daily.loc["2021-01-01"].tolist(), [1.0, 100.0])
+        self.assertEqual(len(daily), 8)
+        self.assertTrue(daily.index.is_monotonic_increasing)
+        self.assertEqual(merged.range_total("2021-01-01", "2021-01-31")["支出"], 140.0)
+        # The inputs are left untouched
+        self.assertEqual(self.rollup.daily.loc["2021-01-01"].tolist(), [0.0, 35.0])
+
+    def test_empty(self):
+        for rollup in (TransactionRollup.from_transactions(transactions([])),
+                       TransactionRollup.merge([])):
+            self.assertEqual(rollup.range_total("2021-01-01", "2021-12-31"),
+                             {"收入": 0.0, "支出": 0.0, "净收入": 0.0})
+            for granularity, (label, _) in TransactionRollup.GRANULARITIES.items():
+                view = rollup.view(granularity)
+                self.assertTrue(view.empty)
+                self.assertEqual(list(view.columns), [label, "收入", "支出", "净收入"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from functools import partial
+from unittest import mock
+
+import pandas as pd
+from openpyxl import Workbook
+
+import wechat_transactions
+from wechat_transactions import (find_csv_header_line, iter_wechat_csv,
+                                 process_wechat_statement)
+
+PREAMBLE = [
+    "微信支付账单明细",
+    "微信昵称：[测试]",
+    "起始时间：[2023-01-01 00:00:00] 终止时间：[2023-02-28 23:59:59]",
+    "导出类型：[全部]",
+    "共4笔记录",
+    "----------------------微信支付账单明细列表--------------------",
+]
+HEADER = ["交易时间", "交易类型", "交易对方", "商品", "收/支", "金额(元)", "支付方式",
+          "当前状态", "交易单号", "商户单号", "备注"]
+ROWS = [
+    ["2023-01-05 10:00:00", "商户消费", "超市", "/", "支出", "12.50", "零钱", "支付成功"],
+    ["2023-01-20 09:00:00", "转账", "张三", "/", "收入", "100.00", "/", "已存入零钱"],
+    ["2023-01-28 18:00:00", "零钱提现", "招商银行", "/", "/", "50.00", "零钱", "提现已到账"],
+    ["2023-02-03 12:30:00", "商户消费", "食堂", "/", "支出", "1,000.00", "零钱", "支付成功"],
+]
+
+
+def statement_csv(currency="¥"):
+    """WeChat CSV export: preamble, "收/支" column, ¥ amounts and tab-padded ids."""
+    lines = PREAMBLE + [",".join(HEADER)]
+    for i, row in enumerate(ROWS):
+        cells = row[:5] + [f'"{currency}{row[5]}"'] + row[6:] + [f"{i}\t", f"{i}\t", "/"]
+        lines.append(",".join(cells))
+    return "\n".join(lines) + "\n"
+
+
+class WeChatCsvTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text, encoding):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+        return path
+
+    def write_xlsx(self):
+        """The same statement as a converted XLSX: "收/支/其他" and numeric amounts."""
+        path = os.path.join(self.tmp.name, "statement.xlsx")
+        wb = Workbook()
+        ws = wb.active
+        for line in PREAMBLE:
+            ws.append([line])
+        ws.append(["收/支/其他" if c == "收/支" else c for c in HEADER])
+        for row in ROWS:
+            ws.append(row[:5] + [float(row[5].replace(",", ""))] + row[6:])
+        wb.save(path)
+        return path
+
+    def test_header_after_preamble(self):
+        required = ["交易时间", "收/支/其他", "金额(元)"]
+        path = self.write("bill.csv", statement_csv(), "utf-8-sig")
+        self.assertEqual(find_csv_header_line(path, required), (len(PREAMBLE), "utf-8-sig"))
+
+        path = self.write("bill_gbk.csv", statement_csv("￥"), "gbk")
+        self.assertEqual(find_csv_header_line(path, required), (len(PREAMBLE), "gbk"))
+
+        path = self.write("other.csv", "a,b,c\n1,2,3\n", "utf-8")
+        self.assertEqual(find_csv_header_line(path, required), (None, None))
+        with self.assertRaises(ValueError):
+            list(iter_wechat_csv(path))
+
+    def test_parsed_transactions(self):
+        for encoding, currency in (("utf-8-sig", "¥"), ("utf-8", "¥"), ("gbk", "￥")):
+            with self.subTest(encoding=encoding):
+                path = self.write("bill.csv", statement_csv(currency), encoding)
+                df = pd.concat(iter_wechat_csv(path))
+                # "收/支" is renamed, only the needed columns are kept
+                self.assertEqual(sorted(df.columns),
+                                 sorted(["交易时间", "交易类型", "交易对方", "收/支/其他", "金额(元)"]))
+                # The "/" (neither income nor expense) row is dropped
+                self.assertEqual(list(df["交易对方"]), ["超市", "张三", "食堂"])
+                self.assertEqual(list(df["金额(元)"]), [12.5, 100.0, 1000.0])
+                self.assertEqual(list(df["收/支/其他"]), ["支出", "收入", "支出"])
+
+    def test_chunked_csv_matches_xlsx(self):
+        csv_path = self.write("bill.csv", statement_csv(), "utf-8-sig")
+        expected = process_wechat_statement(self.write_xlsx())
+        self.assertEqual(list(expected["月份"]), ["2023-01", "2023-02"])
+
+        one_row_chunks = partial(iter_wechat_csv, chunksize=1)
+        with mock.patch.object(wechat_transactions, "iter_wechat_csv", one_row_chunks):
+            pd.testing.assert_frame_equal(process_wechat_statement(csv_path), expected)
+        pd.testing.assert_frame_equal(process_wechat_statement(csv_path), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+WeChat Statement Processing
+
+Everything needed to turn a WeChat Pay statement (PDF, Excel or CSV export)
+into statistics, without any GUI dependency: PDF conversion, the statement
+loaders, the daily rollup behind the day/week/month/quarter/year views, and
+the ranking and recurring-payment accumulators. The desktop app
+(analyze_wechat_transactions.py) and the analysis service
+(analysis_service.py) both build on this module.
+
+Dependencies:
+    pip install pandas openpyxl pdfplumber
+"""
+
+import csv
+import glob
+import heapq
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from pdf_checkpoint import discard_checkpoint, extract_rows_checkpointed
+
+
+def convert_pdf_to_excel(pdf_path, excel_path=None, checkpoint=True, backend="tables",
+                         progress=None, ocr=True, ocr_workers=None, failed_pages=None):
+    """Convert PDF file to Excel spreadsheet.
+
+    With checkpoint enabled, extracted rows are saved per page batch to
+    "<excel_path>.checkpoint.jsonl" so an interrupted conversion resumes
+    where it stopped; the sidecar is removed once the Excel file is written.
+    backend selects the table extraction backend (see pdf_backends.py,
+    "auto" benchmarks the faster ones);
+    progress is an optional callable(pages_done, page_count). With ocr
+    enabled, scanned pages are OCRed when a local engine is installed
+    (see pdf_ocr.py), by at most ocr_workers processes (default: one per CPU).
+    Numbers of pages whose OCR failed are appended to failed_pages; their
+    transactions are missing, and the checkpoint is kept so that a rerun
+    tries them again.
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    if excel_path is None:
+        excel_path = os.path.splitext(pdf_path)[0] + ".xlsx"
+
+    checkpoint_path = excel_path + ".checkpoint.jsonl" if checkpoint else None
+    failed = []
+    all_rows = extract_rows_checkpointed(
+        pdf_path, checkpoint_path, progress=progress, backend=backend, ocr=ocr,
+        ocr_workers=ocr_workers, failed_pages=failed,
+    )
+    if failed_pages is not None:
+        failed_pages.extend(failed)
+
+    if not all_rows:
+        discard_checkpoint(checkpoint_path)
+        return None
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Tables"
+
+    for row_idx, row in enumerate(all_rows, start=1):
+        for col_idx, value in enumerate(row, start=1):
+            ws.cell(row=row_idx, column=col_idx, value=value)
+
+    wb.save(excel_path)
+    if not failed:
+        discard_checkpoint(checkpoint_path)
+    return excel_path
+
+
+def find_header_row(file_path, required_columns):
+    """自动检测表头行的位置"""
+    df = pd.read_excel(file_path, header=None)
+
+    for idx, row in df.iterrows():
+        row_values = [str(v).strip() if pd.notna(v) else "" for v in row.values]
+        matched = 0
+        for col in required_columns:
+            if col in row_values:
+                matched += 1
+        if matched >= 3:  # 匹配至少3个必要列就算找到表头
+            return idx
+
+    return None
+
+
+def clean_wechat_transactions(df):
+    """清洗交易数据: 解析交易时间和金额, 只保留收入/支出记录"""
+    # 将交易时间列转换为datetime类型
+    df["交易时间"] = pd.to_datetime(df["交易时间"], errors="coerce")
+    # 删除无效的日期
+    df = df.dropna(subset=["交易时间"])
+
+    # 将金额(元)列转换为数值类型
+    df["金额(元)"] = pd.to_numeric(df["金额(元)"], errors="coerce")
+    # 删除无效的金额
+    df = df.dropna(subset=["金额(元)"])
+
+    # 确保收支列的值只包含'收入'和'支出'
+    return df[df["收/支/其他"].isin(["收入", "支出"])]
+
+
+def load_wechat_transactions(file_path):
+    """读取微信账单文件并返回清洗后的交易明细"""
+    # 自动检测表头行位置
+    required_columns = ["交易时间", "收/支/其他", "金额(元)"]
+
+    header_row = find_header_row(file_path, required_columns)
+    if header_row is None:
+        raise ValueError("未找到微信账单表头行，文件格式可能不正确")
+
+    # 读取Excel文件，从检测到的表头行开始
+    df = pd.read_excel(file_path, header=header_row)
+    return clean_wechat_transactions(df)
+
+
+# 微信导出的CSV账单使用"收/支"列名, 统一为PDF账单的列名
+CSV_COLUMN_ALIASES = {"收/支": "收/支/其他"}
+# 统计之外保留的明细列 (排行等功能使用, 缺失时忽略)
+DETAIL_COLUMNS = ["交易类型", "交易对方"]
+CSV_ENCODINGS = ("utf-8-sig", "gbk")
+
+
+def find_csv_header_line(file_path, required_columns):
+    """逐行扫描CSV前导说明, 返回表头所在行号和文件编码"""
+    for encoding in CSV_ENCODINGS:
+        try:
+            with open(file_path, encoding=encoding, newline="") as f:
+                for idx, line in enumerate(f):
+                    cells = next(csv.reader([line]), [])
+                    row_values = [
+                        CSV_COLUMN_ALIASES.get(c.strip(), c.strip()) for c in cells
+                    ]
+                    matched = sum(1 for col in required_columns if col in row_values)
+                    if matched >= 3:  # 匹配至少3个必要列就算找到表头
+                        return idx, encoding
+        except UnicodeDecodeError:
+            continue
+    return None, None
+
+
+def iter_wechat_csv(file_path, chunksize=100_000):
+    """分块读取微信CSV账单, 逐块返回清洗后的交易明细"""
+    required_columns = ["交易时间", "收/支/其他", "金额(元)"]
+
+    header_line, encoding = find_csv_header_line(file_path, required_columns)
+    if header_line is None:
+        raise ValueError("未找到微信账单表头行，文件格式可能不正确")
+
+    # 只解析统计和排行需要的列, 其余列直接跳过
+    wanted = set(required_columns) | set(DETAIL_COLUMNS)
+    reader = pd.read_csv(
+        file_path,
+        skiprows=header_line,
+        encoding=encoding,
+        usecols=lambda c: CSV_COLUMN_ALIASES.get(c.strip(), c.strip()) in wanted,
+        dtype=str,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        chunk.columns = [CSV_COLUMN_ALIASES.get(c.strip(), c.strip()) for c in chunk.columns]
+        # 导出的单元格常带有制表符, 金额带有"¥"前缀 (GBK编码的文件中是全角"￥")
+        for col in chunk.columns:
+            chunk[col] = chunk[col].str.strip()
+        chunk["金额(元)"] = chunk["金额(元)"].str.lstrip("¥￥").str.replace(",", "", regex=False)
+        yield clean_wechat_transactions(chunk)
+
+
+def iter_wechat_transactions(file_path):
+    """按文件类型读取微信账单, CSV分块读取, Excel一次读取"""
+    if file_path.lower().endswith(".csv"):
+        yield from iter_wechat_csv(file_path)
+    else:
+        yield load_wechat_transactions(file_path)
+
+
+def build_daily_rollup(df):
+    """按天汇总收入和支出, 作为各时间粒度统计的基础"""
+    if df.empty:
+        return pd.DataFrame(
+            {"收入": [], "支出": []}, index=pd.DatetimeIndex([], name="日期")
+        )
+
+    daily = df.pivot_table(
+        index=df["交易时间"].dt.normalize().rename("日期"),
+        columns="收/支/其他",
+        values="金额(元)",
+        aggfunc="sum",
+        fill_value=0.0,
+    )
+    daily = daily.reindex(columns=["收入", "支出"], fill_value=0.0).astype(float)
+    daily.columns.name = None
+    return daily.sort_index()
+
+
+# 账单中表示"无"的占位值, 不能作为交易对方/交易类型统计
+PLACEHOLDER_KEYS = ("", "/")
+
+
+def detail_keys(column):
+    """清理明细列(交易对方、交易类型)的值, 返回清理后的值和非占位值的掩码"""
+    # PDF表格中较长的名称会折行
+    keys = column.fillna("").astype(str).str.replace("\n", "", regex=False).str.strip()
+    return keys, ~keys.isin(PLACEHOLDER_KEYS)
+
+
+class TransactionRollup:
+    """
+    预计算的按天收支汇总
+
+    只需扫描一次交易明细, 之后日/周/月/季度/年视图和任意日期区间的合计
+    都由按天汇总推导, 无需重新读取账单。
+    """
+
+    # 粒度 -> (表头列名, 周期标签函数)
+    GRANULARITIES = {
+        "日": ("日期", lambda index: index.strftime("%Y-%m-%d")),
+        "周": ("周", lambda index: index.strftime("%G-W%V")),
+        "月": ("月份", lambda index: index.strftime("%Y-%m")),
+        "季度": ("季度", lambda index: index.to_period("Q").astype(str)),
+        "年": ("年份", lambda index: index.strftime("%Y")),
+    }
+
+    def __init__(self, daily):
+        self.daily = daily
+        self._views = {}
+        # 前缀和, 用于O(log n)计算任意日期区间的合计
+        self._cumulative = np.vstack(
+            [np.zeros((1, 2)), daily[["收入", "支出"]].to_numpy().cumsum(axis=0)]
+        )
+
+    @classmethod
+    def from_transactions(cls, df):
+        return cls(build_daily_rollup(df))
+
+    @classmethod
+    def from_dailies(cls, dailies):
+        """合并多份按天汇总 (同一天的金额相加)"""
+        dailies = [d for d in dailies if not d.empty]
+        if not dailies:
+            return cls(build_daily_rollup(pd.DataFrame()))
+        daily = pd.concat(dailies)
+        return cls(daily.groupby(level=0).sum().sort_index())
+
+    @classmethod
+    def merge(cls, rollups):
+        """合并多个账单的汇总"""
+        return cls.from_dailies([r.daily for r in rollups])
+
+    def view(self, granularity="月"):
+        """按指定粒度返回统计表 (结果会缓存, 切换视图无需重新计算)"""
+        if granularity not in self._views:
+            label, period_of = self.GRANULARITIES[granularity]
+            if self.daily.empty:
+                stats = pd.DataFrame(columns=[label, "收入", "支出", "净收入"])
+            else:
+                stats = (
+                    self.daily.groupby(period_of(self.daily.index))
+                    .sum()
+                    .rename_axis(label)
+                    .reset_index()
+                )
+                stats["净收入"] = stats["收入"] - stats["支出"]
+            self._views[granularity] = stats
+        return self._views[granularity]
+
+    def range_total(self, start, end):
+        """计算[start, end]日期区间内的收入、支出和净收入合计 (start晚于end时为0)"""
+        index = self.daily.index
+        lo = index.searchsorted(pd.Timestamp(start).normalize(), side="left")
+        hi = max(lo, index.searchsorted(pd.Timestamp(end).normalize(), side="right"))
+        income, expense = (self._cumulative[hi] - self._cumulative[lo]).tolist()
+        return {"收入": income, "支出": expense, "净收入": income - expense}
+
+
+class RankingAccumulator:
+    """
+    交易对方/交易类型排行的部分聚合
+
+    每个维度只保存 键 -> [金额, 笔数], 内存与不同键的数量成正比, 与交易笔数
+    无关; 可以逐块累加, 也可以合并多个账单的结果。缺失或为"/"的值不参与排行。
+    """
+
+    DIMENSIONS = ("交易对方", "交易类型")
+
+    def __init__(self, direction="支出"):
+        self.direction = direction
+        self.totals = {dim: {} for dim in self.DIMENSIONS}
+
+    def add(self, df):
+        df = df[df["收/支/其他"] == self.direction]
+        for dim, totals in self.totals.items():
+            if dim not in df.columns or df.empty:
+                continue
+            keys, known = detail_keys(df[dim])
+            grouped = df.loc[known, "金额(元)"].groupby(keys[known]).agg(["sum", "count"])
+            for key, amount, count in zip(grouped.index, grouped["sum"], grouped["count"]):
+                entry = totals.get(key)
+                if entry is None:
+                    totals[key] = [float(amount), int(count)]
+                else:
+                    entry[0] += amount
+                    entry[1] += count
+
+    def merge(self, other):
+        for dim, totals in other.totals.items():
+            mine = self.totals[dim]
+            for key, (amount, count) in totals.items():
+                entry = mine.get(key)
+                if entry is None:
+                    mine[key] = [amount, count]
+                else:
+                    entry[0] += amount
+                    entry[1] += count
+        return self
+
+    def top(self, dimension, n=20, by="金额"):
+        """返回按金额或笔数排名前n的键"""
+        index = 0 if by == "金额" else 1
+        items = heapq.nlargest(
+            n, self.totals[dimension].items(), key=lambda kv: kv[1][index]
+        )
+        return pd.DataFrame(
+            [(key, amount, count) for key, (amount, count) in items],
+            columns=[dimension, "金额", "笔数"],
+        )
+
+
+class RecurringPaymentDetector:
+    """
+    周期性支付(订阅、房租等)检测
+
+    逐块只保留交易对方、金额和交易时间。检测时按时间只排序一次, 再按
+    (交易对方, 金额档位) 分组, 用一次线性的相邻间隔计算判断每组的周期。
+    交易对方为空(或账单中的"/")的交易无法归到同一收款方, 直接忽略。
+    """
+
+    # 周期名称 -> (天数, 允许偏差天数)
+    PERIODS = {
+        "每周": (7, 1),
+        "每两周": (14, 2),
+        "每月": (30.4, 3),
+        "每季度": (91.3, 5),
+        "每年": (365.25, 10),
+    }
+
+    COLUMNS = ["交易对方", "周期", "次数", "平均金额", "首次", "最近", "下次预计", "规律度"]
+
+    def __init__(self, direction="支出", band_tolerance=0.1, min_occurrences=3,
+                 min_regularity=0.75):
+        self.direction = direction
+        self.band_tolerance = band_tolerance
+        self.min_occurrences = min_occurrences
+        self.min_regularity = min_regularity
+        self._chunks = []
+
+    def add(self, df):
+        df = df[df["收/支/其他"] == self.direction]
+        if "交易对方" not in df.columns or df.empty:
+            return
+        party, known = detail_keys(df["交易对方"])
+        if not known.any():
+            return
+        self._chunks.append(pd.DataFrame({
+            "交易对方": party[known],
+            "金额": df.loc[known, "金额(元)"].astype(float),
+            "交易时间": df.loc[known, "交易时间"],
+        }))
+
+    def merge(self, other):
+        self._chunks.extend(other._chunks)
+        return self
+
+    def detect(self):
+        """返回检测到的周期性支付, 按平均金额从高到低排列"""
+        if not self._chunks:
+            return pd.DataFrame(columns=self.COLUMNS)
+
+        df = pd.concat(self._chunks, ignore_index=True)
+        df = df[df["金额"] > 0]
+        df["交易对方"] = df["交易对方"].astype("category")
+        # 金额按对数分档, 以该交易对方的金额中位数为档位中心, 与中位数相差不超过
+        # band_tolerance的金额都在中心档, 围绕固定价格小幅波动的订阅不会被拆开
+        log_amount = np.log(df["金额"])
+        center = log_amount.groupby(df["交易对方"], observed=True).transform("median")
+        width = 2 * np.log1p(self.band_tolerance)
+        df["档位"] = np.round((log_amount - center) / width).astype(int)
+
+        # 全局只按时间排序一次, 稳定分组后各组内部仍保持时间顺序
+        df = df.sort_values("交易时间", kind="stable")
+        keys = ["交易对方", "档位"]
+        groups = df.groupby(keys, sort=False, observed=True)
+        interval = groups["交易时间"].diff().dt.total_seconds().to_numpy() / 86400
+
+        period = np.full(len(df), -1)
+        for i, (days, tolerance) in enumerate(self.PERIODS.values()):
+            period[(period == -1) & (np.abs(interval - days) <= tolerance)] = i
+        df["周期"] = period
+
+        summary = groups.agg(
+            次数=("金额", "size"),
+            平均金额=("金额", "mean"),
+            首次=("交易时间", "min"),
+            最近=("交易时间", "max"),
+        ).reset_index()
+        summary = summary[summary["次数"] >= self.min_occurrences]
+
+        # 每组取出现最多的周期, 规律度 = 符合该周期的间隔 / 全部间隔
+        matched = (
+            df[df["周期"] >= 0]
+            .groupby(keys + ["周期"], observed=True)
+            .size()
+            .reset_index(name="匹配")
+            .sort_values("匹配", ascending=False, kind="stable")
+            .drop_duplicates(keys)
+        )
+        result = summary.merge(matched, on=keys)
+        result["规律度"] = result["匹配"] / (result["次数"] - 1)
+        result = result[result["规律度"] >= self.min_regularity]
+
+        names = list(self.PERIODS)
+        days = np.array([d for d, _ in self.PERIODS.values()])
+        result["下次预计"] = result["最近"] + pd.to_timedelta(
+            days[result["周期"].to_numpy()], unit="D"
+        )
+        result["周期"] = [names[i] for i in result["周期"]]
+        result["交易对方"] = result["交易对方"].astype(str)
+
+        return (
+            result.sort_values("平均金额", ascending=False)[self.COLUMNS]
+            .reset_index(drop=True)
+        )
+
+
+def build_wechat_rollup(file_path, accumulators=()):
+    """读取微信账单并构建按天汇总 (逐块汇总, 内存占用与交易笔数无关)
+
+    传入的累加器(排行、周期性支付检测等)在同一次读取中逐块累加。
+    """
+    dailies = []
+    for chunk in iter_wechat_transactions(file_path):
+        dailies.append(build_daily_rollup(chunk))
+        for accumulator in accumulators:
+            accumulator.add(chunk)
+    return TransactionRollup.from_dailies(dailies)
+
+
+def build_wechat_ranking(file_paths, direction="支出"):
+    """逐个账单、逐块累加交易对方和交易类型排行"""
+    ranking = RankingAccumulator(direction)
+    for file_path in file_paths:
+        for chunk in iter_wechat_transactions(file_path):
+            ranking.add(chunk)
+    return ranking
+
+
+def process_wechat_statement(file_path):
+    # 按月统计收入、支出和净收入
+    return build_wechat_rollup(file_path).view("月")
+
+
+def format_ocr_failure(path, failed_pages):
+    """OCR失败页的提示文字"""
+    pages = "、".join(str(p) for p in failed_pages)
+    return f"{os.path.basename(path)} 第{pages}页OCR识别失败, 统计中缺少这些页的交易"
+
+
+def collect_statement_files(paths):
+    """展开命令行参数中的文件和文件夹, PDF先转换为Excel"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(f"{path}/*.xlsx") + glob.glob(f"{path}/*.csv")))
+        elif path.lower().endswith(".pdf"):
+            failed_pages = []
+            excel_path = convert_pdf_to_excel(
+                path, os.path.splitext(path)[0] + "_converted.xlsx",
+                failed_pages=failed_pages,
+            )
+            if failed_pages:
+                print(f"警告: {format_ocr_failure(path, failed_pages)}")
+            if not excel_path:
+                raise ValueError(f"PDF中未找到表格: {path}")
+            files.append(excel_path)
+        else:
+            files.append(path)
+    return files